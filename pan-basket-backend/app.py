@@ -7,38 +7,89 @@ from flask import Flask
 from flask_cors import CORS
 from config import Config
 from utils.db import db 
+from utils.json_provider import FastJSONProvider
+from utils.db_routing import configure_engines
 
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)
 
-db.init_app(app)
+def create_app(config=Config):
+    """Build the Flask app.
 
-from routes.wholesalers import wholesalers_bp
-from routes.basket_entries import basket_entries_bp
-from routes.payments import payments_bp
-from routes.panshops import panshops_bp
-from routes.auth import auth_bp
+    ``config`` is a config object or a dict of overrides on top of ``Config``.
+    Nothing here touches the database or loads the OCR models unless
+    OCR_PRELOAD or OCR_WARMUP asks for it; run ``flask init-db`` to create
+    the tables. Caches, pools and workers are built per app in
+    ``app.extensions`` from that app's own settings.
+    """
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not Config:
+        app.config.from_object(config)
+    CORS(app)
 
+    configure_engines(app.config)
+    db.init_app(app)
 
-app.register_blueprint(wholesalers_bp, url_prefix="/api/wholesalers")
-app.register_blueprint(basket_entries_bp)
-app.register_blueprint(payments_bp, url_prefix="/api/payments")
-app.register_blueprint(panshops_bp, url_prefix="/api/panshops")
-app.register_blueprint(auth_bp)
+    from routes.wholesalers import wholesalers_bp
+    from routes.basket_entries import basket_entries_bp
+    from routes.payments import payments_bp
+    from routes.panshops import panshops_bp
+    from routes.auth import auth_bp
 
-from routes.history import history_bp
-app.register_blueprint(history_bp)
+    app.register_blueprint(wholesalers_bp, url_prefix="/api/wholesalers")
+    app.register_blueprint(basket_entries_bp)
+    app.register_blueprint(payments_bp, url_prefix="/api/payments")
+    app.register_blueprint(panshops_bp, url_prefix="/api/panshops")
+    app.register_blueprint(auth_bp)
 
+    from routes.history import history_bp
+    app.register_blueprint(history_bp)
 
-from routes.dashboard import dashboard_bp
-app.register_blueprint(dashboard_bp)
+    from routes.dashboard import dashboard_bp
+    app.register_blueprint(dashboard_bp)
 
-from routes.ocr import ocr_bp
-app.register_blueprint(ocr_bp)
+    # The OCR routes load easyocr/torch only when a request first needs a reader
+    from routes.ocr import ocr_bp
+    app.register_blueprint(ocr_bp)
 
-with app.app_context():
-    db.create_all()
+    from routes.imports import imports_bp
+    app.register_blueprint(imports_bp)
+
+    from routes.database import database_bp
+    app.register_blueprint(database_bp)
+
+    if app.config['OCR_PRELOAD']:
+        # Under gunicorn --preload this runs once in the master, before fork
+        from utils.ocr_preload import preload_ocr_models
+        preload_ocr_models(app)
+    elif app.config['OCR_WARMUP']:
+        from utils.ocr_pool import get_reader_pool
+        get_reader_pool(app).warm_up()
+
+    from commands import balances_cli, db_indexes_cli, import_csv_command, auth_cli, outbox_cli, ocr_cli, init_db_command, api_cli
+    app.cli.add_command(balances_cli)
+    app.cli.add_command(db_indexes_cli)
+    app.cli.add_command(import_csv_command)
+    app.cli.add_command(auth_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(ocr_cli)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(api_cli)
+
+    if app.config['EMAIL_OUTBOX_WORKER']:
+        from utils.email_outbox import ensure_outbox_worker
+
+        # Started with the first request, so CLI commands never spawn it
+        @app.before_request
+        def start_outbox_worker():
+            ensure_outbox_worker(app)
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True)
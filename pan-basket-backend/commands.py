@@ -0,0 +1,171 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from utils.db import db
+from utils.balances import rebuild_balances, verify_balances
+from utils.bulk_import import import_csv, BulkImportError
+from utils.password_hashing import benchmark_logins
+from utils.email_outbox import drain_outbox
+from utils.token_store import get_token_store
+from utils.serialization import benchmark_list_serialization
+from utils.ocr_preload import worker_memory_report
+from utils.db_indexes import create_missing_indexes, explain_hot_queries
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing tables. Existing tables are left as they are."""
+    # Only on the primary; the read replica gets its schema through replication
+    db.create_all(bind_key=None)
+    click.echo('Database tables created.')
+
+
+balances_cli = AppGroup('balances', help='Maintain the party_balances ledger table.')
+
+
+@balances_cli.command('rebuild')
+def rebuild_balances_command():
+    """Recompute party_balances from basket entries and payments."""
+    count = rebuild_balances()
+    click.echo(f'Rebuilt balances for {count} parties.')
+
+
+@balances_cli.command('verify')
+def verify_balances_command():
+    """Report parties whose stored balance disagrees with the raw tables."""
+    mismatches = verify_balances()
+    for m in mismatches:
+        click.echo(f"{m['party_type']} {m['party_id']}: stored {m['stored']} expected {m['expected']}")
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} balances out of sync; run "flask balances rebuild".')
+    click.echo('All balances match.')
+
+
+db_indexes_cli = AppGroup('db-indexes', help='Create and check the ledger table indexes.')
+
+
+@db_indexes_cli.command('create')
+@click.option('--concurrently', is_flag=True, help='Build without blocking writes (PostgreSQL only).')
+def create_indexes_command(concurrently):
+    """Create indexes declared on the models that the database is missing."""
+    created = create_missing_indexes(concurrently=concurrently)
+    for name in created:
+        click.echo(f'Created {name}')
+    click.echo(f'{len(created)} indexes created.')
+
+
+@db_indexes_cli.command('explain')
+def explain_indexes_command():
+    """Show query plans for the hot endpoints and flag sequential scans."""
+    report = explain_hot_queries()
+    for entry in report:
+        flag = 'SEQ SCAN' if entry['sequential_scan'] else 'ok'
+        click.echo(f"[{flag}] {entry['name']}")
+        for line in entry['plan']:
+            click.echo(f'    {line}')
+    flagged = sum(1 for entry in report if entry['sequential_scan'])
+    if flagged:
+        raise click.ClickException(f'{flagged} queries use a sequential scan; run "flask db-indexes create".')
+
+
+@click.command('import-csv')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--kind', type=click.Choice(['basket', 'payment']), default='basket', show_default=True)
+@click.option('--dry-run', is_flag=True, help='Validate every row without writing anything.')
+@with_appcontext
+def import_csv_command(path, kind, dry_run):
+    """Bulk-load basket entries or payments from a CSV file."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            report = import_csv(f, kind, dry_run=dry_run)
+        except BulkImportError as e:
+            raise click.ClickException(str(e))
+    for error in report['errors']:
+        click.echo(f"line {error['line']}: {error['error']}")
+    verb = 'Validated' if dry_run else 'Imported'
+    click.echo(
+        f"{verb} {report['rows_valid']} of {report['rows_read']} rows via {report['method']} "
+        f"in {report['elapsed_seconds']}s ({report['rows_per_second']} rows/s), {report['error_count']} errors."
+    )
+
+
+auth_cli = AppGroup('auth', help='Authentication maintenance and tuning.')
+
+
+@auth_cli.command('benchmark-hash')
+@click.option('--method', default=None, help='Hash method to test; defaults to PASSWORD_HASH_METHOD.')
+@click.option('--seconds', default=5.0, show_default=True)
+@click.option('--threads', default=None, type=int, help='Concurrent checkers; defaults to one per CPU.')
+def benchmark_hash_command(method, seconds, threads):
+    """Report how many password checks (logins) per second the server can do."""
+    method = method or current_app.config['PASSWORD_HASH_METHOD']
+    result = benchmark_logins(method, seconds=seconds, threads=threads)
+    click.echo(
+        f"{result['method']}: {result['logins_per_second']} logins/s on {result['threads']} threads, "
+        f"{result['logins_per_second_per_core']} per core, {result['ms_per_login']} ms each"
+    )
+
+
+@auth_cli.command('sweep-tokens')
+def sweep_tokens_command():
+    """Delete expired password-reset and verification tokens."""
+    removed = get_token_store().sweep()
+    db.session.commit()
+    click.echo(f'Removed {removed} expired tokens.')
+
+
+outbox_cli = AppGroup('outbox', help='Send queued email.')
+
+
+@outbox_cli.command('drain')
+@click.option('--batch-size', default=None, type=int, help='Messages per SMTP connection; defaults to EMAIL_OUTBOX_BATCH_SIZE.')
+def drain_outbox_command(batch_size):
+    """Send every due message in the outbox, then exit."""
+    totals = {'sent': 0, 'retrying': 0, 'failed': 0, 'deferred': 0}
+    while True:
+        counts = drain_outbox(current_app.config, batch_size)
+        for key, value in counts.items():
+            totals[key] += value
+        # Stop when nothing is due, or when the server can't be reached
+        if not any(counts.values()) or counts['deferred']:
+            break
+    click.echo(
+        f"Sent {totals['sent']}, will retry {totals['retrying']}, gave up on {totals['failed']}, "
+        f"deferred {totals['deferred']} after a connection error."
+    )
+
+
+
+ocr_cli = AppGroup('ocr', help='OCR deployment tools.')
+
+
+@ocr_cli.command('memory')
+@click.argument('master_pid', type=int)
+def ocr_memory_command(master_pid):
+    """Show unique vs shared memory for a gunicorn master and its workers."""
+    report = worker_memory_report(master_pid)
+    if not report:
+        raise click.ClickException(f'No /proc/{master_pid}/smaps_rollup; is the PID right and is this Linux?')
+    click.echo(f"{'role':<8}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'shared MB':>11}{'unique MB':>11}")
+    for m in report:
+        click.echo(
+            f"{m['role']:<8}{m['pid']:>8}{m.get('rss_kb', 0) / 1024:>10.1f}{m.get('pss_kb', 0) / 1024:>10.1f}"
+            f"{m['shared_kb'] / 1024:>11.1f}{m['unique_kb'] / 1024:>11.1f}"
+        )
+
+
+api_cli = AppGroup('api', help='API performance tools.')
+
+
+@api_cli.command('bench-serialization')
+@click.option('--rows', default=20000, show_default=True, help='Synthetic basket entries to list.')
+@click.option('--repeat', default=3, show_default=True, help='Runs per approach; the best is reported.')
+@with_appcontext
+def bench_serialization_command(rows, repeat):
+    """Compare ORM objects + stdlib JSON with projected rows + the app's JSON provider."""
+    timings = benchmark_list_serialization(db.session, current_app._get_current_object(), rows=rows, repeat=repeat)
+    for label, timing in timings.items():
+        click.echo(f"{label:<12}{timing['seconds']:>10.4f}s{timing['rows_per_second']:>12} rows/s")
+    speedup = timings['orm_to_dict']['seconds'] / timings['projected']['seconds']
+    click.echo(f'speedup     {speedup:>10.1f}x')
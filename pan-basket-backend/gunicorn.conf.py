@@ -0,0 +1,26 @@
+# gunicorn.conf.py -- gunicorn -c gunicorn.conf.py app:app
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# With OCR_PRELOAD the master imports the app (and loads the OCR models)
+# once, and every worker shares those pages copy-on-write
+preload_app = Config.OCR_PRELOAD
+
+
+def post_fork(server, worker):
+    from utils.ocr_preload import init_ocr_worker
+    init_ocr_worker(Config.OCR_TORCH_THREADS)
+
+    if preload_app:
+        # Don't share the master's pooled connections with the workers
+        from utils.db import db
+        with server.app.wsgi().app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
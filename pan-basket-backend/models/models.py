@@ -1,7 +1,6 @@
 # models/models.py
 from datetime import datetime
 from utils.db import db
-from werkzeug.security import generate_password_hash, check_password_hash
 
 
 class User(db.Model):
@@ -13,15 +12,9 @@ class User(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     email_verified = db.Column(db.Boolean, default=False)
-    verification_token = db.Column(db.String(100), nullable=True)
+    verification_token = db.Column(db.String(100), nullable=True, index=True)
     verification_token_expires_at = db.Column(db.DateTime, nullable=True)
     
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-        
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-    
     def to_dict(self):
         return {
             'id': self.id,
@@ -38,7 +31,7 @@ class Wholesaler(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     contact_info = db.Column(db.String(200), nullable=True)
-    mark = db.Column(db.String(50), nullable=True) 
+    mark = db.Column(db.String(50), nullable=True, index=True)
 
     def to_dict(self):
         return {
@@ -50,6 +43,11 @@ class Wholesaler(db.Model):
 
 class BasketEntry(db.Model):
     __tablename__ = 'basket_entries'
+    __table_args__ = (
+        db.Index('ix_basket_entries_party_date', 'party_type', 'party_id', 'date'),
+        db.Index('ix_basket_entries_date_id', 'date', 'id'),
+        db.Index('ix_basket_entries_mark', 'mark'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     party_type = db.Column(db.String(20))  
     party_id = db.Column(db.Integer, nullable=False)
@@ -60,6 +58,10 @@ class BasketEntry(db.Model):
     mark = db.Column(db.String(50), nullable=True)
 
 class Payment(db.Model):
+    __table_args__ = (
+        db.Index('ix_payment_party_date', 'party_type', 'party_id', 'date'),
+        db.Index('ix_payment_date_id', 'date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     party_type = db.Column(db.String(50), nullable=False)
     party_id = db.Column(db.Integer, nullable=False)
@@ -81,3 +83,39 @@ class PanShop(db.Model):
             'name': self.name,
             'contact_info': self.contact_info
         }
+
+class PartyBalance(db.Model):
+    """Running totals per party, kept in step with basket entries and payments."""
+    __tablename__ = 'party_balances'
+    party_type = db.Column(db.String(20), primary_key=True)
+    party_id = db.Column(db.Integer, primary_key=True)
+    total_basket_value = db.Column(db.Float, nullable=False, default=0)
+    total_paid = db.Column(db.Float, nullable=False, default=0)
+    balance = db.Column(db.Float, nullable=False, default=0)
+
+class AuthToken(db.Model):
+    """Single-use tokens (password reset, email verification) shared by all workers."""
+    __tablename__ = 'auth_tokens'
+    token = db.Column(db.String(100), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'reset' or 'verify'
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class EmailOutbox(db.Model):
+    """Mail waiting to be sent by the outbox worker."""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body_html = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sent' or 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lock_token = db.Column(db.String(32), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
@@ -1,48 +1,37 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
+from functools import wraps
 from models.models import User
+from utils.auth_cache import UserSnapshot, get_auth_cache
 from utils.db import db
+from utils.email_outbox import enqueue_email, wake_outbox_worker
+from utils.token_store import get_token_store, RESET_TOKEN_TTL, VERIFY_TOKEN_TTL
+from utils.password_hashing import get_password_hasher, PasswordHasherBusy
 import jwt
 import datetime
+import logging
 import os
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 # Secret key for JWT 
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'dev-secret-key')
 
-# Email configuration
-EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
-EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
-EMAIL_USER = os.environ.get('EMAIL_USER', 'your-email@gmail.com')
-EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', 'your-app-password')
-EMAIL_FROM = os.environ.get('EMAIL_FROM', 'no-reply@panbasket.com')
-
-# Store reset tokens
-reset_tokens = {}
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 def send_email(to_email, subject, body_html):
-    """Send email using SMTP"""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_FROM
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body_html, 'html'))
-        
-        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-        server.starttls()
-        server.login(EMAIL_USER, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Error sending email: {str(e)}")
-        return False
+    """Queue an email in the outbox as part of the current transaction.
+
+    The caller commits, so the message is stored together with the user or
+    token it is about, and then calls ``wake_outbox_worker``.
+    """
+    enqueue_email(to_email, subject, body_html)
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -66,16 +55,14 @@ def register():
         is_admin=data.get('is_admin', False),
         email_verified=False
     )
-    new_user.set_password(data['password'])
-    
-    # Generate verification token
-    token = secrets.token_urlsafe(32)
-    new_user.verification_token = token
-    new_user.verification_token_expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=7)
+    new_user.password_hash = get_password_hasher().hash(data['password'])
     
     db.session.add(new_user)
-    db.session.commit()
+    db.session.flush()  # Get the user ID for the token
     
+    # Generate verification token
+    token = secrets.token_urlsafe(32)
+    get_token_store().put('verify', token, new_user.id, VERIFY_TOKEN_TTL)
     
     verification_link = f"{request.host_url.rstrip('/')}/verify-email/{token}"
     
@@ -92,7 +79,15 @@ def register():
     </html>
     """
     
+    # The user, the token and the email are committed together
     send_email(new_user.email, subject, body_html)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception('Failed to register user %s', data['username'])
+        return jsonify({'error': 'Registration failed, please try again'}), 500
+    wake_outbox_worker()
     
     return jsonify({
         'message': 'User registered successfully. Please check your email to verify your account.',
@@ -109,9 +104,15 @@ def login():
     # Find user by username
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
+    hasher = get_password_hasher()
+    if not user or not hasher.verify(user.password_hash, data['password']):
         return jsonify({'error': 'Invalid username or password'}), 401
     
+    # Upgrade hashes made with an older PASSWORD_HASH_METHOD while we have the password
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = hasher.hash(data['password'])
+        db.session.commit()
+    
     # Check if email is verified
     if not user.email_verified and not data.get('ignore_verification'):
         return jsonify({
@@ -146,55 +147,67 @@ def login():
         'expires_at': expiration.isoformat()
     })
 
-@auth_bp.route('/me', methods=['GET'])
-def get_current_user():
+def authenticate_request():
+    """Resolve the request's bearer token to a user snapshot.
+
+    Verified tokens are cached with the user they belong to, so repeat
+    requests skip both the JWT signature check and the user lookup.
+    Returns ``(user, None)`` or ``(None, error_response)``.
+    """
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({'error': 'Authorization header is missing or invalid'}), 401
+        return None, (jsonify({'error': 'Authorization header is missing or invalid'}), 401)
     
     token = auth_header.split(' ')[1]
+    cache = get_auth_cache()
+    user = cache.get(token)
+    if user:
+        return user, None
     
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        user = User.query.get(payload['user_id'])
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify(user.to_dict())
     except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token has expired'}), 401
+        return None, (jsonify({'error': 'Token has expired'}), 401)
     except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
+        return None, (jsonify({'error': 'Invalid token'}), 401)
+    
+    user = User.query.get(payload['user_id'])
+    if not user:
+        return None, (jsonify({'error': 'User not found'}), 404)
+    
+    snapshot = UserSnapshot(user)
+    cache.set(token, snapshot, payload.get('exp'))
+    return snapshot, None
+
+@auth_bp.route('/me', methods=['GET'])
+def get_current_user():
+    user, error = authenticate_request()
+    if error:
+        return error
+    return jsonify(user.to_dict())
 
 # Utility function to check if a token is valid
 def token_required(f):
-    from functools import wraps
-    
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authorization header is missing or invalid'}), 401
-        
-        token = auth_header.split(' ')[1]
-        
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            request.current_user = User.query.get(payload['user_id'])
-            
-            if not request.current_user:
-                return jsonify({'error': 'User not found'}), 404
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-            
+        user, error = authenticate_request()
+        if error:
+            return error
+        request.current_user = user
         return f(*args, **kwargs)
     
     return decorated 
 
+def require_auth():
+    """``before_request`` hook that applies ``token_required`` to a whole blueprint."""
+    # CORS preflight requests never carry the Authorization header
+    if request.method == 'OPTIONS' or not current_app.config.get('AUTH_REQUIRED', True):
+        return None
+    user, error = authenticate_request()
+    if error:
+        return error
+    request.current_user = user
+
 @auth_bp.route('/forgot-password', methods=['POST'])
 def forgot_password():
     data = request.get_json()
@@ -211,12 +224,8 @@ def forgot_password():
     # Generate a secure token
     token = secrets.token_urlsafe(32)
     
-    # Store token with expiration (24 hours)
-    expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-    reset_tokens[token] = {
-        'user_id': user.id,
-        'expiration': expiration
-    }
+    # Store token with expiration (24 hours), visible to every worker
+    get_token_store().put('reset', token, user.id, RESET_TOKEN_TTL)
     
     # Create reset link
     reset_link = f"{request.host_url.rstrip('/')}/reset-password/{token}"
@@ -236,13 +245,17 @@ def forgot_password():
     </html>
     """
     
-    # Send email
-    email_sent = send_email(user.email, subject, body_html)
-    
-    if email_sent:
-        return jsonify({'message': 'If your email is registered, you will receive a password reset link'}), 200
-    else:
+    # Queue the email and commit it with the token
+    send_email(user.email, subject, body_html)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception('Failed to queue password reset email for user %s', user.id)
         return jsonify({'error': 'Failed to send reset email'}), 500
+    wake_outbox_worker()
+    
+    return jsonify({'message': 'If your email is registered, you will receive a password reset link'}), 200
 
 @auth_bp.route('/reset-password/<token>', methods=['POST'])
 def reset_password(token):
@@ -252,56 +265,46 @@ def reset_password(token):
         return jsonify({'error': 'New password is required'}), 400
     
     # Check if token exists and is valid
-    if token not in reset_tokens:
+    store = get_token_store()
+    user_id = store.get('reset', token)
+    if user_id is None:
         return jsonify({'error': 'Invalid or expired token'}), 400
     
-    token_data = reset_tokens[token]
-    
-    # Check if token is expired
-    if datetime.datetime.utcnow() > token_data['expiration']:
-        # Remove expired token
-        del reset_tokens[token]
-        return jsonify({'error': 'Token has expired'}), 400
-    
     # Get user and update password
-    user = User.query.get(token_data['user_id'])
+    user = User.query.get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    user.set_password(data['password'])
-    db.session.commit()
+    user.password_hash = get_password_hasher().hash(data['password'])
     
-    # Remove used token
-    del reset_tokens[token]
+    # Remove used token in the same commit as the new password
+    store.pop('reset', token)
+    db.session.commit()
     
     return jsonify({'message': 'Password has been reset successfully'}), 200
 
 @auth_bp.route('/verify-reset-token/<token>', methods=['GET'])
 def verify_reset_token(token):
     # Check if token exists and is valid
-    if token not in reset_tokens:
-        return jsonify({'valid': False}), 200
-    
-    token_data = reset_tokens[token]
-    
-    # Check if token is expired
-    if datetime.datetime.utcnow() > token_data['expiration']:
-        # Remove expired token
-        del reset_tokens[token]
-        return jsonify({'valid': False}), 200
-    
-    return jsonify({'valid': True}), 200 
+    valid = get_token_store().get('reset', token) is not None
+    return jsonify({'valid': valid}), 200 
 
 @auth_bp.route('/verify-email/<token>', methods=['GET'])
 def verify_email(token):
-    user = User.query.filter_by(verification_token=token).first()
+    store = get_token_store()
+    user_id = store.pop('verify', token)
+    if user_id is not None:
+        user = User.query.get(user_id)
+    else:
+        # Links sent before the token store existed carry the token on the user row
+        user = User.query.filter_by(verification_token=token).first()
+        expires_at = user.verification_token_expires_at if user else None
+        if user and (expires_at is None or datetime.datetime.utcnow() > expires_at):
+            # A legacy token without an expiry can't be trusted to be recent
+            return jsonify({'error': 'Verification token has expired'}), 400
     
     if not user:
-        return jsonify({'error': 'Invalid verification token'}), 400
-    
-    # Check if token is expired
-    if datetime.datetime.utcnow() > user.verification_token_expires_at:
-        return jsonify({'error': 'Verification token has expired'}), 400
+        return jsonify({'error': 'Invalid or expired verification token'}), 400
     
     # Mark email as verified
     user.email_verified = True
@@ -326,11 +329,13 @@ def resend_verification():
     if user.email_verified:
         return jsonify({'message': 'Email is already verified'}), 200
     
-    # Generate new verification token
+    # Generate new verification token; links from earlier emails stop working
     token = secrets.token_urlsafe(32)
-    user.verification_token = token
-    user.verification_token_expires_at = datetime.datetime.utcnow() + datetime.timedelta(days=7)
-    db.session.commit()
+    store = get_token_store()
+    store.revoke_user('verify', user.id)
+    user.verification_token = None
+    user.verification_token_expires_at = None
+    store.put('verify', token, user.id, VERIFY_TOKEN_TTL)
     
     # Send verification email
     verification_link = f"{request.host_url.rstrip('/')}/verify-email/{token}"
@@ -348,9 +353,14 @@ def resend_verification():
     </html>
     """
     
-    email_sent = send_email(user.email, subject, body_html)
-    
-    if email_sent:
-        return jsonify({'message': 'Verification email sent successfully'}), 200
-    else:
-        return jsonify({'error': 'Failed to send verification email'}), 500 
\ No newline at end of file
+    # Revoking the old links, the new token and the email commit together
+    send_email(user.email, subject, body_html)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception('Failed to queue verification email for user %s', user.id)
+        return jsonify({'error': 'Failed to send verification email'}), 500
+    wake_outbox_worker()
+    
+    return jsonify({'message': 'Verification email sent successfully'}), 200 
\ No newline at end of file
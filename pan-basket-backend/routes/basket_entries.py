@@ -1,9 +1,20 @@
-from flask import Blueprint, request, jsonify
+import logging
+from flask import Blueprint, request, jsonify, current_app
 from models.models import BasketEntry, Wholesaler, PanShop
 from utils.db import db
+from sqlalchemy import func, update
+from utils.balances import new_deltas, apply_balance_deltas, record_basket_value
+from utils.batch_writes import write_batch, basket_entry_values, BATCH_MODES
+from utils.serialization import BASKET_ENTRY_FIELDS, with_required
+from utils.validation import coerce_numbers
+from utils.pagination import encode_cursor, decode_cursor, after_cursor, parse_limit, estimate_count
 from datetime import datetime
+from routes.auth import require_auth
+
+logger = logging.getLogger(__name__)
 
 basket_entries_bp = Blueprint('basket_entries', __name__, url_prefix='/api/basket-entries')
+basket_entries_bp.before_request(require_auth)
 
 # route to basket_entries.py
 @basket_entries_bp.route('/add', methods=['POST'])
@@ -14,34 +25,26 @@ def add_basket_entry():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        required_fields = ['party_type', 'party_id', 'date', 'basket_count', 'price_per_basket']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'{field} is required'}), 400
+        try:
+            values = basket_entry_values(data)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        if values['party_type'] not in ('wholesaler', 'panshop'):
+            return jsonify({'error': "party_type must be 'wholesaler' or 'panshop'"}), 400
 
-        if data['party_type'] == 'wholesaler':
-            party = Wholesaler.query.get(data['party_id'])
+        if values['party_type'] == 'wholesaler':
+            party = Wholesaler.query.get(values['party_id'])
         else:
-            party = PanShop.query.get(data['party_id'])
+            party = PanShop.query.get(values['party_id'])
             
         if not party:
-            return jsonify({'error': f'{data["party_type"].capitalize()} not found'}), 404
-
-        # Calculate total price
-        total_price = data['basket_count'] * data['price_per_basket']
-
-        # Create new entry
-        entry = BasketEntry(
-            party_type=data['party_type'],
-            party_id=data['party_id'],
-            date=datetime.strptime(data['date'], '%Y-%m-%d').date(),
-            basket_count=data['basket_count'],
-            price_per_basket=data['price_per_basket'],
-            total_price=total_price,
-            mark=data.get('mark', '')
-        )
+            return jsonify({'error': f'{values["party_type"].capitalize()} not found'}), 404
+
+        # Create new entry; total_price is basket_count * price_per_basket
+        entry = BasketEntry(**values)
 
         db.session.add(entry)
+        record_basket_value(entry.party_type, entry.party_id, entry.total_price)
         db.session.commit()
 
         return jsonify({
@@ -62,6 +65,31 @@ def add_basket_entry():
         db.session.rollback()
         return jsonify({'error': f'Failed to add basket entry: {str(e)}'}), 500
 
+@basket_entries_bp.route('/batch', methods=['POST'])
+def add_basket_entries_batch():
+    data = request.get_json()
+    items = data.get('items') if isinstance(data, dict) else data
+    mode = data.get('mode', 'atomic') if isinstance(data, dict) else 'atomic'
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if mode not in BATCH_MODES:
+        return jsonify({'error': f"mode must be one of: {', '.join(BATCH_MODES)}"}), 400
+    max_items = current_app.config['WRITE_BATCH_MAX_ITEMS']
+    if len(items) > max_items:
+        return jsonify({'error': f'At most {max_items} items per batch'}), 400
+
+    try:
+        results, created = write_batch('basket', items, mode)
+    except Exception:
+        db.session.rollback()
+        logger.exception('Basket entry batch write failed')
+        return jsonify({'error': 'Failed to write batch'}), 500
+
+    failed = sum(1 for r in results if r['status'] == 'error')
+    status = 201 if created else 400
+    return jsonify({'mode': mode, 'created': created, 'failed': failed, 'results': results}), status
+
 
 @basket_entries_bp.route('', methods=['GET'])
 def get_basket_entries():
@@ -71,6 +99,11 @@ def get_basket_entries():
     party_id = request.args.get('party_id')
     date = request.args.get('date')
     
+    try:
+        fields = BASKET_ENTRY_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     query = BasketEntry.query
     
     if party_type:
@@ -86,32 +119,63 @@ def get_basket_entries():
         except ValueError:
             pass
     
-    total = query.count()
-    
-    # Apply pagination
-    entries = query.order_by(BasketEntry.date.desc(), BasketEntry.id.desc()).paginate(page=page, per_page=per_page)
+    # Cursor mode: constant cost per page however deep the client scrolls
+    if 'cursor' in request.args or 'limit' in request.args:
+        return _get_basket_entries_by_cursor(query, fields)
+
+    # Apply pagination (paginate runs the one COUNT for the total)
+    entries = query.with_entities(*BASKET_ENTRY_FIELDS.columns(fields)).order_by(
+        BasketEntry.date.desc(), BasketEntry.id.desc()
+    ).paginate(page=page, per_page=per_page)
     
-    result = []
-    for entry in entries.items:
-        result.append({
-            'id': entry.id,
-            'party_type': entry.party_type,
-            'party_id': entry.party_id,
-            'date': entry.date.isoformat(),
-            'basket_count': entry.basket_count,
-            'price_per_basket': entry.price_per_basket,
-            'total_price': entry.total_price,
-            'mark': entry.mark
-        })
+    result = BASKET_ENTRY_FIELDS.dump(entries.items, fields)
     
     return jsonify({
         'entries': result,
-        'total': total,
+        'total': entries.total,
         'page': page,
         'per_page': per_page,
         'pages': entries.pages
     })
 
+def _get_basket_entries_by_cursor(query, fields):
+    total_mode = request.args.get('total', 'none')
+    if total_mode not in ['none', 'exact', 'approx']:
+        return jsonify({'error': "total must be 'none', 'exact' or 'approx'"}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'), default=10)
+        cursor = None
+        if request.args.get('cursor'):
+            cursor_date, cursor_id = decode_cursor(request.args['cursor'], 2)
+            cursor = [datetime.strptime(cursor_date, '%Y-%m-%d').date(), int(cursor_id)]
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = {'limit': limit}
+    if total_mode == 'exact':
+        response['total'] = query.order_by(None).count()
+        response['total_is_estimate'] = False
+    elif total_mode == 'approx':
+        response['total'], response['total_is_estimate'] = estimate_count(query)
+
+    if cursor:
+        query = query.filter(after_cursor([BasketEntry.date, BasketEntry.id], cursor, descending=True))
+    # The cursor needs date and id even when the client didn't ask for them
+    columns = with_required(fields, ['date', 'id'])
+    entries = query.with_entities(*BASKET_ENTRY_FIELDS.columns(columns)).order_by(
+        BasketEntry.date.desc(), BasketEntry.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(entries) > limit:
+        last = entries[limit - 1]
+        next_cursor = encode_cursor([last.date.isoformat(), last.id])
+
+    response['entries'] = BASKET_ENTRY_FIELDS.dump(entries[:limit], columns, include=fields)
+    response['next_cursor'] = next_cursor
+    return jsonify(response)
+
 @basket_entries_bp.route('/<int:entry_id>', methods=['PUT'])
 def update_basket_entry(entry_id):
     data = request.get_json()
@@ -123,10 +187,16 @@ def update_basket_entry(entry_id):
     if not entry:
         return jsonify({'error': f'Basket entry with ID {entry_id} not found'}), 404
     
+    changes = {field: data[field] for field in BULK_EDIT_FIELDS if field in data}
+    try:
+        _coerce_bulk_changes(changes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     # Check if party exists
-    if data.get('party_type') and data.get('party_id'):
-        party_type = data.get('party_type')
-        party_id = data.get('party_id')
+    if changes.get('party_type') and changes.get('party_id'):
+        party_type = changes['party_type']
+        party_id = changes['party_id']
         
         if party_type == 'wholesaler':
             party = Wholesaler.query.get(party_id)
@@ -136,58 +206,40 @@ def update_basket_entry(entry_id):
         if not party:
             return jsonify({'error': f'{party_type.capitalize()} with ID {party_id} not found'}), 400
     
+    # Move the entry's old value off its old party; the new value is added back below
+    balance_deltas = new_deltas()
+    balance_deltas[(entry.party_type, entry.party_id)][0] -= entry.total_price
+
     # Update the entry
-    if 'party_type' in data:
-        entry.party_type = data['party_type']
-    
-    if 'party_id' in data:
-        entry.party_id = data['party_id']
-    
-    if 'date' in data:
-        try:
-            entry.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-    
-    if 'basket_count' in data:
-        entry.basket_count = data['basket_count']
-    
-    if 'price_per_basket' in data:
-        entry.price_per_basket = data['price_per_basket']
-    
-    if 'total_price' in data:
-        entry.total_price = data['total_price']
-    
-    if 'mark' in data:
-        entry.mark = data['mark']
+    for field, value in changes.items():
+        setattr(entry, field, value)
     
+    balance_deltas[(entry.party_type, entry.party_id)][0] += entry.total_price
+
     # Update related entries if requested
     related_updated = 0
     if data.get('update_related') and entry.mark:
         # Get the original mark before any changes
         original_mark = data.get('original_mark', entry.mark)
-        
-        # Find all entries with the same mark
-        related_entries = BasketEntry.query.filter(
-            BasketEntry.mark == original_mark,
-            BasketEntry.id != entry_id
-        ).all()
-        
-        for related in related_entries:
-            # Only update party information, not other fields
-            if data.get('party_type'):
-                related.party_type = data['party_type']
-            
-            if data.get('party_id'):
-                related.party_id = data['party_id']
-            
-            # Update the mark if it was changed
-            if 'mark' in data and data['mark'] != original_mark:
-                related.mark = data['mark']
-            
-            related_updated += 1
+
+        # Only update party information and the mark, not other fields
+        changes = {}
+        if data.get('party_type'):
+            changes['party_type'] = data['party_type']
+        if data.get('party_id'):
+            changes['party_id'] = data['party_id']
+        if 'mark' in data and data['mark'] != original_mark:
+            changes['mark'] = data['mark']
+
+        if changes:
+            related_updated = _bulk_update_entries(
+                [BasketEntry.mark == original_mark, BasketEntry.id != entry_id],
+                changes,
+                balance_deltas
+            )
     
     try:
+        apply_balance_deltas(balance_deltas)
         db.session.commit()
         return jsonify({
             'success': True,
@@ -198,6 +250,126 @@ def update_basket_entry(entry_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to update entry: {str(e)}'}), 500
 
+def _bulk_update_entries(conditions, changes, balance_deltas):
+    """Apply ``changes`` to every entry matching ``conditions`` in one UPDATE.
+
+    Balance deltas come from one grouped SELECT per party taken before the
+    update, so no entry is loaded into the session. Returns the row count.
+    """
+    if any(field in changes for field in ('party_type', 'party_id', 'basket_count', 'price_per_basket', 'total_price')):
+        groups = db.session.query(
+            BasketEntry.party_type,
+            BasketEntry.party_id,
+            func.count(BasketEntry.id),
+            func.coalesce(func.sum(BasketEntry.total_price), 0),
+            func.coalesce(func.sum(BasketEntry.basket_count), 0),
+            func.coalesce(func.sum(BasketEntry.price_per_basket), 0)
+        ).filter(*conditions).group_by(BasketEntry.party_type, BasketEntry.party_id).all()
+
+        for party_type, party_id, count, total, baskets, prices in groups:
+            if 'total_price' in changes:
+                new_total = changes['total_price'] * count
+            elif 'basket_count' in changes and 'price_per_basket' in changes:
+                new_total = changes['basket_count'] * changes['price_per_basket'] * count
+            elif 'price_per_basket' in changes:
+                new_total = changes['price_per_basket'] * baskets
+            elif 'basket_count' in changes:
+                new_total = changes['basket_count'] * prices
+            else:
+                new_total = total
+            new_party = (changes.get('party_type', party_type), changes.get('party_id', party_id))
+            balance_deltas[(party_type, party_id)][0] -= total
+            balance_deltas[new_party][0] += new_total
+
+    values = dict(changes)
+    # Keep total_price consistent with the row's own count and price
+    if 'total_price' not in values and ('basket_count' in values or 'price_per_basket' in values):
+        values['total_price'] = (
+            values.get('basket_count', BasketEntry.basket_count) *
+            values.get('price_per_basket', BasketEntry.price_per_basket)
+        )
+
+    result = db.session.execute(
+        update(BasketEntry).where(*conditions).values(values).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+BULK_EDIT_FIELDS = ['party_type', 'party_id', 'date', 'basket_count', 'price_per_basket', 'total_price', 'mark']
+
+# How each numeric bulk-edit field is coerced; the values end up in SQL arithmetic
+BULK_NUMERIC_FIELDS = {'party_id': int, 'basket_count': int, 'price_per_basket': float, 'total_price': float}
+
+def _coerce_bulk_changes(changes):
+    """Validate and convert bulk-edit values in place; raises ValueError with a client message."""
+    coerce_numbers(changes, BULK_NUMERIC_FIELDS)
+    if 'party_type' in changes and changes['party_type'] not in ('wholesaler', 'panshop'):
+        raise ValueError("party_type must be 'wholesaler' or 'panshop'")
+    if 'mark' in changes and changes['mark'] is not None and not isinstance(changes['mark'], str):
+        raise ValueError('mark must be a string')
+    if 'date' in changes:
+        try:
+            changes['date'] = datetime.strptime(changes['date'], '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            raise ValueError('Invalid date. Use YYYY-MM-DD')
+
+@basket_entries_bp.route('/bulk-update', methods=['POST'])
+def bulk_update_basket_entries():
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    filters = data.get('filter') or {}
+    changes = {field: data['changes'][field] for field in BULK_EDIT_FIELDS if field in (data.get('changes') or {})}
+
+    if not changes:
+        return jsonify({'error': f"changes must include one of: {', '.join(BULK_EDIT_FIELDS)}"}), 400
+
+    conditions = []
+    try:
+        if filters.get('mark'):
+            conditions.append(BasketEntry.mark == filters['mark'])
+        if filters.get('party_type'):
+            conditions.append(BasketEntry.party_type == filters['party_type'])
+        if filters.get('party_id'):
+            conditions.append(BasketEntry.party_id == int(filters['party_id']))
+        if filters.get('start_date'):
+            conditions.append(BasketEntry.date >= datetime.strptime(filters['start_date'], '%Y-%m-%d').date())
+        if filters.get('end_date'):
+            conditions.append(BasketEntry.date <= datetime.strptime(filters['end_date'], '%Y-%m-%d').date())
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid filter. Use YYYY-MM-DD for dates'}), 400
+
+    try:
+        _coerce_bulk_changes(changes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Never rewrite the whole ledger by accident
+    if not conditions:
+        return jsonify({'error': 'filter must include mark, party_type, party_id, start_date or end_date'}), 400
+
+    if 'party_type' in changes or 'party_id' in changes:
+        if 'party_type' not in changes or 'party_id' not in changes:
+            return jsonify({'error': 'party_type and party_id must be changed together'}), 400
+        if changes['party_type'] == 'wholesaler':
+            party = Wholesaler.query.get(changes['party_id'])
+        else:
+            party = PanShop.query.get(changes['party_id'])
+        if not party:
+            return jsonify({'error': f"{changes['party_type'].capitalize()} with ID {changes['party_id']} not found"}), 400
+
+    try:
+        balance_deltas = new_deltas()
+        updated = _bulk_update_entries(conditions, changes, balance_deltas)
+        apply_balance_deltas(balance_deltas)
+        db.session.commit()
+        return jsonify({'success': True, 'updated': updated})
+    except Exception:
+        db.session.rollback()
+        logger.exception('Bulk update of basket entries failed')
+        return jsonify({'error': 'Failed to update entries'}), 500
+
 @basket_entries_bp.route('/<int:entry_id>', methods=['DELETE'])
 def delete_basket_entry(entry_id):
     entry = BasketEntry.query.get(entry_id)
@@ -205,6 +377,7 @@ def delete_basket_entry(entry_id):
         return jsonify({'error': f'Basket entry with ID {entry_id} not found'}), 404
     
     try:
+        record_basket_value(entry.party_type, entry.party_id, -entry.total_price)
         db.session.delete(entry)
         db.session.commit()
         return jsonify({'success': True, 'message': 'Basket entry deleted successfully'})
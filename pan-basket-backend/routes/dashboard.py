@@ -1,97 +1,87 @@
+import calendar
 from flask import Blueprint, jsonify
-from models.models import BasketEntry, Payment, Wholesaler, PanShop
+from models.models import BasketEntry, Payment, Wholesaler, PanShop, PartyBalance
 from utils.db import db
-from sqlalchemy import func
+from sqlalchemy import func, case, extract, select
+from utils.db_routing import read_replica
+from routes.auth import require_auth
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard-summary')
+dashboard_bp.before_request(require_auth)
 
 @dashboard_bp.route('/', methods=['GET'])
+@read_replica
 def dashboard_summary():
+    # Every section is a single grouped query, so the number of queries stays
+    # the same no matter how many parties or entries there are.
+
     # --- Summary Cards
-    total_basket_value = db.session.query(func.coalesce(func.sum(BasketEntry.total_price), 0)).scalar()
-    total_paid = db.session.query(func.coalesce(func.sum(Payment.amount), 0)).scalar()
+    totals = db.session.query(
+        func.coalesce(func.sum(PartyBalance.total_basket_value), 0).label("basket"),
+        func.coalesce(func.sum(PartyBalance.total_paid), 0).label("paid"),
+        select(func.count(BasketEntry.id)).scalar_subquery().label("basket_count"),
+        select(func.count(Payment.id)).scalar_subquery().label("payment_count")
+    ).one()
+    total_basket_value = totals.basket
+    total_paid = totals.paid
     total_due = total_basket_value - total_paid
-    total_transactions = db.session.query(BasketEntry).count() + db.session.query(Payment).count()
+    total_transactions = totals.basket_count + totals.payment_count
 
     # --- Top 5 Wholesalers by Due ---
-    wholesaler_dues = []
-    for party in Wholesaler.query.all():
-        basket = db.session.query(func.coalesce(func.sum(BasketEntry.total_price), 0)).filter_by(party_type='wholesaler', party_id=party.id).scalar()
-        paid = db.session.query(func.coalesce(func.sum(Payment.amount), 0)).filter_by(party_type='wholesaler', party_id=party.id).scalar()
-        due = basket - paid
-        wholesaler_dues.append({"name": party.name, "due": due})
-    top_wholesaler_dues = sorted(wholesaler_dues, key=lambda x: x["due"], reverse=True)[:5]
+    def top_balances(Model, party_type):
+        balance = func.coalesce(PartyBalance.balance, 0)
+        return (
+            db.session.query(Model.name, balance.label("balance"))
+            .outerjoin(PartyBalance, (PartyBalance.party_type == party_type) & (PartyBalance.party_id == Model.id))
+            .order_by(balance.desc())
+            .limit(5)
+            .all()
+        )
+
+    top_wholesaler_dues = [{"name": row.name, "due": row.balance} for row in top_balances(Wholesaler, 'wholesaler')]
 
     # --- Top 5 Pan Shops by Balance ---
-    panshop_balances = []
-    for party in PanShop.query.all():
-        basket = db.session.query(func.coalesce(func.sum(BasketEntry.total_price), 0)).filter_by(party_type='panshop', party_id=party.id).scalar()
-        paid = db.session.query(func.coalesce(func.sum(Payment.amount), 0)).filter_by(party_type='panshop', party_id=party.id).scalar()
-        balance = basket - paid
-        panshop_balances.append({"name": party.name, "balance": balance})
-    top_panshop_balances = sorted(panshop_balances, key=lambda x: x["balance"], reverse=True)[:5]
+    top_panshop_balances = [{"name": row.name, "balance": row.balance} for row in top_balances(PanShop, 'panshop')]
 
     # --- Daily Basket Inflow/Outflow (last 30 days) ---
     # Inflow: baskets to wholesalers, Outflow: baskets to pan shops
-    inflow_query = (
+    daily_query = (
         db.session.query(
             BasketEntry.date,
-            func.sum(BasketEntry.basket_count).label("inflow")
+            func.sum(case((BasketEntry.party_type == 'wholesaler', BasketEntry.basket_count), else_=0)).label("inflow"),
+            func.sum(case((BasketEntry.party_type == 'panshop', BasketEntry.basket_count), else_=0)).label("outflow")
         )
-        .filter(BasketEntry.party_type == 'wholesaler')
+        .filter(BasketEntry.party_type.in_(['wholesaler', 'panshop']))
         .group_by(BasketEntry.date)
         .order_by(BasketEntry.date.desc())
         .limit(30)
     )
-    outflow_query = (
-        db.session.query(
-            BasketEntry.date,
-            func.sum(BasketEntry.basket_count).label("outflow")
-        )
-        .filter(BasketEntry.party_type == 'panshop')
-        .group_by(BasketEntry.date)
-        .order_by(BasketEntry.date.desc())
-        .limit(30)
-    )
-
-    inflow_map = {row.date: row.inflow for row in inflow_query}
-    outflow_map = {row.date: row.outflow for row in outflow_query}
-    all_dates = set(inflow_map.keys()) | set(outflow_map.keys())
-    daily_basket = []
-    for d in sorted(all_dates):
-        daily_basket.append({
-            "date": d.strftime("%Y-%m-%d"),
-            "inflow": int(inflow_map.get(d) or 0),
-            "outflow": int(outflow_map.get(d) or 0)
-        })
+    daily_basket = [{
+        "date": row.date.strftime("%Y-%m-%d"),
+        "inflow": int(row.inflow or 0),
+        "outflow": int(row.outflow or 0)
+    } for row in reversed(daily_query.all())]
 
     # --- Monthly Payment Trend (last 12 months, incoming and outgoing) ---
-    def monthly_sum(party_type):
-        return (
-            db.session.query(
-                func.to_char(func.date_trunc('month', Payment.date), 'Mon').label("month"),
-                func.date_trunc('month', Payment.date).label("month_start"),
-                func.sum(Payment.amount).label("total")
-            )
-            .filter(Payment.party_type == party_type)
-            .group_by(func.date_trunc('month', Payment.date))
-            .order_by(func.date_trunc('month', Payment.date).desc())
-            .limit(12)
-            .all()
+    year = extract('year', Payment.date)
+    month = extract('month', Payment.date)
+    monthly_query = (
+        db.session.query(
+            year.label("year"),
+            month.label("month"),
+            func.sum(case((Payment.party_type == 'panshop', Payment.amount), else_=0)).label("incoming"),
+            func.sum(case((Payment.party_type == 'wholesaler', Payment.amount), else_=0)).label("outgoing")
         )
-
-    incoming = monthly_sum('panshop')
-    outgoing = monthly_sum('wholesaler')
-
-    month_map = {}
-    for row in incoming:
-        month_map[row.month_start] = {"month": row.month, "incoming": float(row.total or 0), "outgoing": 0}
-    for row in outgoing:
-        if row.month_start in month_map:
-            month_map[row.month_start]["outgoing"] = float(row.total or 0)
-        else:
-            month_map[row.month_start] = {"month": row.month, "incoming": 0, "outgoing": float(row.total or 0)}
-    monthly_payments = [month_map[k] for k in sorted(month_map.keys())]
+        .filter(Payment.party_type.in_(['panshop', 'wholesaler']))
+        .group_by(year, month)
+        .order_by(year.desc(), month.desc())
+        .limit(12)
+    )
+    monthly_payments = [{
+        "month": calendar.month_abbr[int(row.month)],
+        "incoming": float(row.incoming or 0),
+        "outgoing": float(row.outgoing or 0)
+    } for row in reversed(monthly_query.all())]
 
     return jsonify({
         "total_basket_value": total_basket_value,
@@ -102,4 +92,4 @@ def dashboard_summary():
         "top_panshop_balances": top_panshop_balances,
         "daily_basket": daily_basket,
         "monthly_payments": monthly_payments
-    })
\ No newline at end of file
+    })
@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify, current_app
+from utils.db import db
+from utils.db_pool import pool_stats
+from utils.db_routing import replica_stats
+from routes.auth import require_auth
+
+database_bp = Blueprint('database', __name__, url_prefix='/api/db')
+database_bp.before_request(require_auth)
+
+@database_bp.route('/pool-stats', methods=['GET'])
+def database_pool_stats():
+    return jsonify({
+        'pools': pool_stats(db.engines),
+        'replica': replica_stats(current_app),
+    })
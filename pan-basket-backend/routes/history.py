@@ -1,10 +1,21 @@
-from flask import Blueprint, request, jsonify
+import csv
+import heapq
+import io
+import json
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from models.models import BasketEntry, Payment, Wholesaler, PanShop
+from utils.db import db
+from sqlalchemy import func, select
 from datetime import datetime
+from utils.serialization import HISTORY_BASKET_FIELDS, HISTORY_PAYMENT_FIELDS, with_required
+from utils.db_routing import read_replica
+from routes.auth import require_auth
 
 history_bp = Blueprint('history', __name__, url_prefix='/api/history')
+history_bp.before_request(require_auth)
 
 @history_bp.route('/', methods=['GET'])
+@read_replica
 def get_transaction_history():
     party_type = request.args.get('party_type')
     party_id = request.args.get('party_id')
@@ -20,8 +31,18 @@ def get_transaction_history():
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
 
+    try:
+        basket_fields = HISTORY_BASKET_FIELDS.parse(request.args.get('basket_fields'))
+        payment_fields = HISTORY_PAYMENT_FIELDS.parse(request.args.get('payment_fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The totals need total_price and amount even when they aren't returned
+    basket_columns = with_required(basket_fields, ['total_price'])
+    payment_columns = with_required(payment_fields, ['amount'])
+
     # Fetch baskets
-    baskets = BasketEntry.query.filter(
+    baskets = db.session.query(*HISTORY_BASKET_FIELDS.columns(basket_columns)).filter(
         BasketEntry.party_type == party_type,
         BasketEntry.party_id == int(party_id),
         BasketEntry.date >= start,
@@ -29,28 +50,15 @@ def get_transaction_history():
     ).all()
 
     # Fetch payments
-    payments = Payment.query.filter(
+    payments = db.session.query(*HISTORY_PAYMENT_FIELDS.columns(payment_columns)).filter(
         Payment.party_type == party_type,
         Payment.party_id == int(party_id),
         Payment.date >= start,
         Payment.date <= end
     ).all()
 
-    basket_list = [{
-        "date": b.date.strftime('%Y-%m-%d'),
-        "basket_count": b.basket_count,
-        "price_per_basket": b.price_per_basket,
-        "total_price": b.total_price,
-        "mark": b.mark
-    } for b in baskets]
-
-    payment_list = [{
-        "date": p.date.strftime('%Y-%m-%d'),
-        "amount": p.amount,
-        "payment_mode": p.payment_mode,
-        "upi_account": p.upi_account,
-        "note": p.note
-    } for p in payments]
+    basket_list = HISTORY_BASKET_FIELDS.dump(baskets, basket_columns, include=basket_fields)
+    payment_list = HISTORY_PAYMENT_FIELDS.dump(payments, payment_columns, include=payment_fields)
 
     total_basket_value = sum(b.total_price for b in baskets)
     total_paid = sum(p.amount for p in payments)
@@ -64,3 +72,139 @@ def get_transaction_history():
             "balance": total_basket_value - total_paid
         }
     })
+
+
+EXPORT_COLUMNS = [
+    'type', 'date', 'id', 'basket_count', 'price_per_basket', 'total_price', 'mark',
+    'amount', 'payment_mode', 'upi_account', 'note', 'running_balance'
+]
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_rows(party_type, party_id, start, end):
+    """Yield baskets and payments merged in date order, with a running balance.
+
+    Both sides are read through server-side cursors in batches, so memory
+    stays flat however long the date range is.
+    """
+    baskets = db.session.query(
+        BasketEntry.date, BasketEntry.id, BasketEntry.basket_count,
+        BasketEntry.price_per_basket, BasketEntry.total_price, BasketEntry.mark
+    ).filter(
+        BasketEntry.party_type == party_type,
+        BasketEntry.party_id == party_id,
+        BasketEntry.date >= start,
+        BasketEntry.date <= end
+    ).order_by(BasketEntry.date, BasketEntry.id).yield_per(EXPORT_BATCH_SIZE)
+
+    payments = db.session.query(
+        Payment.date, Payment.id, Payment.amount,
+        Payment.payment_mode, Payment.upi_account, Payment.note
+    ).filter(
+        Payment.party_type == party_type,
+        Payment.party_id == party_id,
+        Payment.date >= start,
+        Payment.date <= end
+    ).order_by(Payment.date, Payment.id).yield_per(EXPORT_BATCH_SIZE)
+
+    basket_rows = ({
+        'type': 'basket', 'date': b.date.strftime('%Y-%m-%d'), 'id': b.id,
+        'basket_count': b.basket_count, 'price_per_basket': b.price_per_basket,
+        'total_price': b.total_price, 'mark': b.mark, '_sort': (b.date, 0, b.id)
+    } for b in baskets)
+    payment_rows = ({
+        'type': 'payment', 'date': p.date.strftime('%Y-%m-%d'), 'id': p.id,
+        'amount': p.amount, 'payment_mode': p.payment_mode,
+        'upi_account': p.upi_account, 'note': p.note, '_sort': (p.date, 1, p.id)
+    } for p in payments)
+
+    balance = 0
+    for row in heapq.merge(basket_rows, payment_rows, key=lambda r: r['_sort']):
+        del row['_sort']
+        balance += row.get('total_price') or 0
+        balance -= row.get('amount') or 0
+        row['running_balance'] = balance
+        yield row
+
+
+@history_bp.route('/export', methods=['GET'])
+@read_replica
+def export_transaction_history():
+    party_type = request.args.get('party_type')
+    party_id = request.args.get('party_id')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    export_format = request.args.get('format', 'csv')
+
+    if not all([party_type, party_id, start_date, end_date]):
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    if party_type not in ['wholesaler', 'panshop']:
+        return jsonify({'error': "party_type must be 'wholesaler' or 'panshop'"}), 400
+
+    if export_format not in ['csv', 'ndjson']:
+        return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+
+    try:
+        party_id = int(party_id)
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    # Totals come from SQL up front so they can go in the headers
+    total_basket_value, total_paid = db.session.query(
+        select(func.coalesce(func.sum(BasketEntry.total_price), 0)).where(
+            BasketEntry.party_type == party_type,
+            BasketEntry.party_id == party_id,
+            BasketEntry.date >= start,
+            BasketEntry.date <= end
+        ).scalar_subquery(),
+        select(func.coalesce(func.sum(Payment.amount), 0)).where(
+            Payment.party_type == party_type,
+            Payment.party_id == party_id,
+            Payment.date >= start,
+            Payment.date <= end
+        ).scalar_subquery()
+    ).one()
+    summary = {
+        'total_basket_value': total_basket_value,
+        'total_paid': total_paid,
+        'balance': total_basket_value - total_paid
+    }
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for count, row in enumerate(_export_rows(party_type, party_id, start, end), 1):
+            writer.writerow(row)
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        yield json.dumps(dict(summary, type='summary')) + '\n'
+        lines = []
+        for row in _export_rows(party_type, party_id, start, end):
+            lines.append(json.dumps(row))
+            if len(lines) == EXPORT_BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+
+    filename = f'history_{party_type}_{party_id}_{start.isoformat()}_{end.isoformat()}.{export_format}'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Total-Basket-Value': str(summary['total_basket_value']),
+        'X-Total-Paid': str(summary['total_paid']),
+        'X-Balance': str(summary['balance'])
+    })
@@ -0,0 +1,33 @@
+import io
+import logging
+from flask import Blueprint, request, jsonify
+from utils.bulk_import import import_csv, BulkImportError
+from utils.db import db
+from routes.auth import require_auth
+
+logger = logging.getLogger(__name__)
+
+imports_bp = Blueprint('imports', __name__, url_prefix='/api/import')
+imports_bp.before_request(require_auth)
+
+@imports_bp.route('', methods=['POST'])
+def import_ledger_csv():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    kind = request.form.get('kind', request.args.get('kind', 'basket'))
+    dry_run = request.form.get('dry_run', request.args.get('dry_run', 'false')).lower() == 'true'
+
+    # Decode the upload as it is read instead of loading it into memory
+    stream = io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig', newline='')
+    try:
+        report = import_csv(stream, kind, dry_run=dry_run)
+    except (BulkImportError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        db.session.rollback()
+        logger.exception('CSV import failed')
+        return jsonify({'error': 'Import failed'}), 500
+
+    return jsonify(report), 200 if dry_run else 201
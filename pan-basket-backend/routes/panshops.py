@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify
 from utils.db import db
 from models.models import PanShop
+from utils.serialization import PANSHOP_FIELDS
+from routes.auth import require_auth
 
 panshops_bp = Blueprint('panshops', __name__)
+panshops_bp.before_request(require_auth)
 
 @panshops_bp.route('/', methods=['POST'])
 def add_panshop():
@@ -17,5 +20,9 @@ def add_panshop():
 
 @panshops_bp.route('/', methods=['GET'])
 def get_panshops():
-    panshops = PanShop.query.all()
-    return jsonify([p.to_dict() for p in panshops])
+    try:
+        fields = PANSHOP_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = db.session.query(*PANSHOP_FIELDS.columns(fields)).order_by(PanShop.id).all()
+    return jsonify(PANSHOP_FIELDS.dump(rows, fields))
@@ -1,79 +1,131 @@
-from flask import Blueprint, request, jsonify
+import logging
+import math
+from flask import Blueprint, request, jsonify, current_app
 from utils.db import db
 from datetime import datetime
 from models.models import BasketEntry, Payment
 from flask import jsonify
-from models.models import Wholesaler, PanShop
+from models.models import Wholesaler, PanShop, PartyBalance
+from utils.balances import record_payment, get_party_balance
+from utils.batch_writes import write_batch, payment_values, BATCH_MODES
+from utils.serialization import PAYMENT_FIELDS, PAYMENT_PARTY_JOINS, with_required
+from utils.pagination import encode_cursor, decode_cursor, after_cursor, parse_limit
+from utils.db_routing import read_replica
+from routes.auth import require_auth
 
+logger = logging.getLogger(__name__)
 
 payments_bp = Blueprint('payments', __name__, url_prefix='/api/payments')
+payments_bp.before_request(require_auth)
 
 @payments_bp.route("/", methods=["POST"])
 def add_payment():
     data = request.get_json()
-    payment = Payment(
-        party_type=data["party_type"],
-        party_id=data["party_id"],
-        amount=data["amount"],
-        date=datetime.strptime(data["date"], "%Y-%m-%d").date(),
-        note=data.get("note", ""),
-        payment_mode=data["payment_mode"],
-        upi_account=data.get("upi_account")  # Optional
-    )
+    if not data:
+        return jsonify({"error": "No data provided"}), 400
+    try:
+        values = payment_values(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    if values["party_type"] not in ("wholesaler", "panshop"):
+        return jsonify({"error": "party_type must be 'wholesaler' or 'panshop'"}), 400
+
+    payment = Payment(**values)
     db.session.add(payment)
+    record_payment(payment.party_type, payment.party_id, payment.amount)
     db.session.commit()
     return jsonify({"message": "Payment recorded successfully"}), 201
 
 
+@payments_bp.route("/batch", methods=["POST"])
+def add_payments_batch():
+    data = request.get_json()
+    items = data.get("items") if isinstance(data, dict) else data
+    mode = data.get("mode", "atomic") if isinstance(data, dict) else "atomic"
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if mode not in BATCH_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(BATCH_MODES)}"}), 400
+    max_items = current_app.config["WRITE_BATCH_MAX_ITEMS"]
+    if len(items) > max_items:
+        return jsonify({"error": f"At most {max_items} items per batch"}), 400
+
+    try:
+        results, created = write_batch("payment", items, mode)
+    except Exception:
+        db.session.rollback()
+        logger.exception("Payment batch write failed")
+        return jsonify({"error": "Failed to write batch"}), 500
+
+    failed = sum(1 for r in results if r["status"] == "error")
+    status = 201 if created else 400
+    return jsonify({"mode": mode, "created": created, "failed": failed, "results": results}), status
+
+
 @payments_bp.route("/", methods=["GET"])
 def get_payments():
     party_type = request.args.get("party_type")
     party_id = request.args.get("party_id")
 
-    query = Payment.query
+    try:
+        start_date = request.args.get("start_date")
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None
+        end_date = request.args.get("end_date")
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None
+        paginate = "limit" in request.args or "cursor" in request.args
+        fields = PAYMENT_FIELDS.parse(request.args.get("fields"))
+        limit = parse_limit(request.args.get("limit"))
+        cursor = None
+        if request.args.get("cursor"):
+            cursor_date, cursor_id = decode_cursor(request.args["cursor"], 2)
+            cursor = [datetime.strptime(cursor_date, "%Y-%m-%d").date(), int(cursor_id)]
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    columns = with_required(fields, ["date", "id"]) if paginate else fields
+    query = db.session.query(*PAYMENT_FIELDS.columns(columns)).select_from(Payment)
+    if "party_name" in columns:
+        # Resolve party names in the same query instead of one lookup per payment
+        for party_model, onclause in PAYMENT_PARTY_JOINS:
+            query = query.outerjoin(party_model, onclause)
+
     if party_type:
-        query = query.filter_by(party_type=party_type)
+        query = query.filter(Payment.party_type == party_type)
     if party_id:
-        query = query.filter_by(party_id=int(party_id))
-
-    payments = query.order_by(Payment.date.desc()).all()
-
-    result = []
-    for p in payments:
-        party_name = "Unknown"
-        if p.party_type == "wholesaler":
-            party = Wholesaler.query.get(p.party_id)
-            if party:
-                party_name = party.name
-        elif p.party_type == "panshop":
-            party = PanShop.query.get(p.party_id)
-            if party:
-                party_name = party.name
-
-        result.append({
-            "id": p.id,
-            "party_type": p.party_type,
-            "party_id": p.party_id,
-            "party_name": party_name,
-            "amount": p.amount,
-            "date": p.date.strftime("%Y-%m-%d"),
-            "note": p.note,
-            "payment_mode": p.payment_mode,
-            "upi_account": p.upi_account
-        })
+        query = query.filter(Payment.party_id == int(party_id))
+    if start_date:
+        query = query.filter(Payment.date >= start_date)
+    if end_date:
+        query = query.filter(Payment.date <= end_date)
+    if request.args.get("payment_mode"):
+        query = query.filter(Payment.payment_mode == request.args["payment_mode"])
+    if cursor:
+        query = query.filter(after_cursor([Payment.date, Payment.id], cursor, descending=True))
+
+    query = query.order_by(Payment.date.desc(), Payment.id.desc())
+    payments = query.limit(limit + 1).all() if paginate else query.all()
+
+    result = PAYMENT_FIELDS.dump(payments[:limit] if paginate else payments, columns, include=fields)
+
+    if not paginate:
+        return jsonify(result)
 
-    return jsonify(result)
+    next_cursor = None
+    if len(payments) > limit:
+        last = payments[limit - 1]
+        next_cursor = encode_cursor([last.date.isoformat(), last.id])
+
+    return jsonify({
+        "payments": result,
+        "next_cursor": next_cursor
+    })
 
 
 @payments_bp.route('/wholesaler/<int:party_id>', methods=['GET'])
 def wholesaler_balance(party_id):
     wholesaler = Wholesaler.query.get(party_id)
-    baskets = BasketEntry.query.filter_by(party_type='wholesaler', party_id=party_id).all()
-    payments = Payment.query.filter_by(party_type='wholesaler', party_id=party_id).all()
-
-    total_basket_value = sum(b.total_price for b in baskets)
-    total_paid = sum(p.amount for p in payments)
-    balance = total_basket_value - total_paid
+    total_basket_value, total_paid, balance = get_party_balance('wholesaler', party_id)
 
     return jsonify({
         "party_type": "wholesaler",
@@ -88,12 +140,7 @@ def wholesaler_balance(party_id):
 @payments_bp.route('/panshop/<int:party_id>', methods=['GET'])
 def panshop_balance(party_id):
     panshop = PanShop.query.get(party_id)
-    baskets = BasketEntry.query.filter_by(party_type='panshop', party_id=party_id).all()
-    payments = Payment.query.filter_by(party_type='panshop', party_id=party_id).all()
-
-    total_basket_value = sum(b.total_price for b in baskets)
-    total_received = sum(p.amount for p in payments)
-    balance = total_basket_value - total_received
+    total_basket_value, total_received, balance = get_party_balance('panshop', party_id)
 
     return jsonify({
         "party_type": "panshop",
@@ -140,35 +187,113 @@ def panshop_balance(party_id):
 
 
 
+BALANCE_SORT_KEYS = ('name', 'balance', 'paid')
+
+
+def _float_arg(name):
+    """Read an optional numeric query parameter; raises ValueError if it isn't a finite number."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+
 @payments_bp.route('/balance-summary', methods=['GET'])
+@read_replica
 def get_balance_summary():
     party_type = request.args.get('party_type')
 
     if party_type not in ['wholesaler', 'panshop']:
         return jsonify({"error": "Invalid party type"}), 400
 
-    Model = Wholesaler if party_type == 'wholesaler' else PanShop
-    parties = Model.query.all()
+    sort = request.args.get('sort', 'name')
+    if sort not in BALANCE_SORT_KEYS:
+        return jsonify({"error": f"sort must be one of: {', '.join(BALANCE_SORT_KEYS)}"}), 400
+
+    order = request.args.get('order', 'asc' if sort == 'name' else 'desc')
+    if order not in ['asc', 'desc']:
+        return jsonify({"error": "order must be 'asc' or 'desc'"}), 400
+
+    try:
+        min_balance = _float_arg('min_balance')
+        max_balance = _float_arg('max_balance')
+        paginate = 'limit' in request.args or 'cursor' in request.args
+        limit = parse_limit(request.args.get('limit'))
+        cursor = None
+        if request.args.get('cursor'):
+            # The cursor carries the ordering it was issued for; a key from one
+            # sort is meaningless under another
+            cursor_sort, cursor_order, *cursor = decode_cursor(request.args['cursor'], 4)
+            if (cursor_sort, cursor_order) != (sort, order):
+                raise ValueError(f"cursor was issued for sort={cursor_sort}&order={cursor_order}")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    summaries = []
+    Model = Wholesaler if party_type == 'wholesaler' else PanShop
+    basket_value = db.func.coalesce(PartyBalance.total_basket_value, 0)
+    total_paid = db.func.coalesce(PartyBalance.total_paid, 0)
+    balance = db.func.coalesce(PartyBalance.balance, 0)
+
+    query = db.session.query(
+        Model.id,
+        Model.name,
+        basket_value.label('total_basket_value'),
+        total_paid.label('total_paid'),
+        balance.label('balance')
+    ).outerjoin(
+        PartyBalance,
+        db.and_(PartyBalance.party_type == party_type, PartyBalance.party_id == Model.id)
+    )
 
-    for party in parties:
-        # Use simple .filter_by() for total basket value
-        basket_value = db.session.query(
-            db.func.coalesce(db.func.sum(BasketEntry.total_price), 0)
-        ).filter_by(party_type=party_type, party_id=party.id).scalar()
+    if min_balance is not None:
+        query = query.filter(balance >= min_balance)
+    if max_balance is not None:
+        query = query.filter(balance <= max_balance)
+    if request.args.get('name_prefix'):
+        query = query.filter(db.func.lower(Model.name).startswith(request.args['name_prefix'].lower(), autoescape=True))
+
+    sort_column = {'name': Model.name, 'balance': balance, 'paid': total_paid}[sort]
+    descending = order == 'desc'
+    if cursor:
+        query = query.filter(after_cursor([sort_column, Model.id], cursor, descending))
+    if descending:
+        query = query.order_by(sort_column.desc(), Model.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), Model.id.asc())
+
+    if paginate:
+        parties = query.limit(limit + 1).all()
+    else:
+        parties = query.all()
 
-        total_paid = db.session.query(
-            db.func.coalesce(db.func.sum(Payment.amount), 0)
-        ).filter_by(party_type=party_type, party_id=party.id).scalar()
+    summaries = []
 
+    for party in parties[:limit] if paginate else parties:
         summaries.append({
             "party_id": party.id,
             "party_type": party_type,
             "party_name": party.name,
-            "total_basket_value": basket_value,
-            "total_paid": total_paid,
-            "balance": basket_value - total_paid
+            "total_basket_value": party.total_basket_value,
+            "total_paid": party.total_paid,
+            "balance": party.balance
         })
 
-    return jsonify(summaries)
+    if not paginate:
+        return jsonify(summaries)
+
+    next_cursor = None
+    if len(parties) > limit:
+        last = parties[limit - 1]
+        key = {'name': last.name, 'balance': last.balance, 'paid': last.total_paid}[sort]
+        next_cursor = encode_cursor([sort, order, key, last.id])
+
+    return jsonify({
+        "summaries": summaries,
+        "next_cursor": next_cursor
+    })
@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify
 from models.models import Wholesaler
 from utils.db import db
+from utils.serialization import WHOLESALER_FIELDS
+from routes.auth import require_auth
 
 wholesalers_bp = Blueprint('wholesalers_bp', __name__)
+wholesalers_bp.before_request(require_auth)
 
 @wholesalers_bp.route('/', methods=['GET'])
 def get_wholesalers():
-    wholesalers = Wholesaler.query.all()
-    return jsonify([w.to_dict() for w in wholesalers])
+    try:
+        fields = WHOLESALER_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = db.session.query(*WHOLESALER_FIELDS.columns(fields)).order_by(Wholesaler.id).all()
+    return jsonify(WHOLESALER_FIELDS.dump(rows, fields))
 
 
 @wholesalers_bp.route('/', methods=['POST'])
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Set before config.py is imported so the module-level app never reaches for PostgreSQL
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+os.environ['AUTH_REQUIRED'] = 'false'
+os.environ['EMAIL_OUTBOX_WORKER'] = 'false'
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from utils.db import db
+
+
+def make_app(tmp_path, **overrides):
+    config = {'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}"}
+    config.update(overrides)
+    return create_app(config)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class StatementCounter:
+    """Counts the statements run on ``engine`` while it is in use as a context manager."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
@@ -0,0 +1,55 @@
+from utils.auth_cache import get_auth_cache, invalidate_user
+from utils.email_outbox import ensure_outbox_worker
+from utils.ocr_cache import get_ocr_cache
+from utils.ocr_pool import get_reader_pool
+from utils.password_hashing import get_password_hasher
+from utils.token_store import InMemoryTokenStore, DatabaseTokenStore, get_token_store
+
+from conftest import make_app
+
+
+def test_each_app_builds_its_own_helpers_from_its_own_config(tmp_path):
+    first = make_app(tmp_path, AUTH_CACHE_SIZE=10, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+                     OCR_READER_POOL_SIZE=1, OCR_CACHE_SIZE=5, AUTH_TOKEN_STORE='memory')
+    second = make_app(tmp_path, AUTH_CACHE_SIZE=20, PASSWORD_HASH_METHOD='scrypt',
+                      OCR_READER_POOL_SIZE=2, OCR_CACHE_SIZE=7, AUTH_TOKEN_STORE='database')
+
+    with first.app_context():
+        assert get_auth_cache().max_entries == 10
+        assert get_password_hasher().method == 'pbkdf2:sha256:1000'
+        assert get_reader_pool().size == 1
+        assert get_ocr_cache().max_entries == 5
+        assert isinstance(get_token_store(), InMemoryTokenStore)
+        assert get_auth_cache() is get_auth_cache(first)
+
+    with second.app_context():
+        assert get_auth_cache().max_entries == 20
+        assert get_password_hasher().method == 'scrypt'
+        assert get_reader_pool().size == 2
+        assert get_ocr_cache().max_entries == 7
+        assert isinstance(get_token_store(), DatabaseTokenStore)
+
+
+def test_user_invalidation_only_touches_the_current_app(tmp_path):
+    first, second = make_app(tmp_path), make_app(tmp_path)
+    with first.app_context():
+        first_calls = []
+        get_auth_cache().invalidate_user = first_calls.append
+    with second.app_context():
+        second_calls = []
+        get_auth_cache().invalidate_user = second_calls.append
+        invalidate_user(7)
+
+    assert (first_calls, second_calls) == ([], [7])
+
+
+def test_outbox_worker_belongs_to_its_app(tmp_path):
+    first, second = make_app(tmp_path), make_app(tmp_path)
+    workers = []
+    try:
+        workers = [ensure_outbox_worker(first), ensure_outbox_worker(second)]
+        assert workers[0].app is first and workers[1].app is second
+        assert ensure_outbox_worker(first) is workers[0]
+    finally:
+        for worker in workers:
+            worker.stop(timeout=5)
@@ -0,0 +1,52 @@
+import pytest
+
+from models.models import PartyBalance, Wholesaler
+from utils.db import db
+
+
+@pytest.fixture
+def wholesaler(app):
+    wholesaler = Wholesaler(name='W', contact_info='', mark='M')
+    db.session.add(wholesaler)
+    db.session.commit()
+    return wholesaler
+
+
+def basket(**overrides):
+    item = {'party_type': 'wholesaler', 'party_id': 1, 'date': '2024-01-01', 'basket_count': 2, 'price_per_basket': 10}
+    item.update(overrides)
+    return item
+
+
+def payment(**overrides):
+    item = {'party_type': 'wholesaler', 'party_id': 1, 'date': '2024-01-01', 'amount': 5, 'payment_mode': 'cash'}
+    item.update(overrides)
+    return item
+
+
+@pytest.mark.parametrize('overrides, error', [
+    ({'basket_count': True}, 'basket_count must be a number'),
+    ({'basket_count': 1.5}, 'basket_count must be a whole number'),
+    ({'price_per_basket': '-inf'}, 'price_per_basket must be a finite number'),
+    ({'price_per_basket': 'nan'}, 'price_per_basket must be a finite number'),
+    ({'price_per_basket': -1}, 'price_per_basket cannot be negative'),
+])
+def test_basket_batch_rejects_bad_numbers(client, wholesaler, overrides, error):
+    response = client.post('/api/basket-entries/batch', json={'items': [basket(), basket(**overrides)], 'mode': 'best_effort'})
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['created'] == 1
+    assert body['results'][1] == {'index': 1, 'status': 'error', 'error': error}
+    assert db.session.query(PartyBalance.total_basket_value).scalar() == 20
+
+
+def test_payment_batch_rejects_non_finite_amount(client, wholesaler):
+    response = client.post('/api/payments/batch', json={'items': [payment(amount='nan')]})
+
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == 'amount must be a finite number'
+
+    summary = client.get('/api/payments/balance-summary?party_type=wholesaler')
+    assert summary.status_code == 200
+    assert summary.get_json()[0]['balance'] == 0
@@ -0,0 +1,39 @@
+import io
+
+from models.models import PartyBalance, Wholesaler
+from utils.bulk_import import import_csv
+from utils.db import db
+
+PAYMENTS = """party_type,party_id,date,amount,payment_mode
+wholesaler,1,2024-01-01,"1,250",cash
+wholesaler,1,2024-01-02,inf,cash
+wholesaler,1,2024-01-03,nan,cash
+wholesaler,1,2024-01-04,-5,cash
+"""
+
+BASKETS = """party_type,party_id,date,basket_count,price_per_basket,total_price
+wholesaler,1,2024-01-01,2,10,
+wholesaler,1,2024-01-02,1.5,10,
+wholesaler,1,2024-01-03,2,10,-inf
+"""
+
+
+def test_non_finite_and_negative_numbers_are_line_errors(app):
+    db.session.add(Wholesaler(name='W', contact_info='', mark='M'))
+    db.session.commit()
+
+    payments = import_csv(io.StringIO(PAYMENTS), 'payment')
+    baskets = import_csv(io.StringIO(BASKETS), 'basket')
+
+    assert payments['rows_inserted'] == 1
+    assert payments['errors'] == [
+        {'line': 3, 'error': 'amount must be a finite number'},
+        {'line': 4, 'error': 'amount must be a finite number'},
+        {'line': 5, 'error': 'amount cannot be negative'},
+    ]
+    assert baskets['rows_inserted'] == 1
+    assert baskets['errors'] == [
+        {'line': 3, 'error': 'basket_count must be a whole number'},
+        {'line': 4, 'error': 'total_price must be a finite number'},
+    ]
+    assert db.session.query(PartyBalance.total_basket_value, PartyBalance.total_paid).one() == (20, 1250)
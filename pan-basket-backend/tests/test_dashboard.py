@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from models.models import BasketEntry, PanShop, Payment, Wholesaler
+from utils.balances import rebuild_balances
+from utils.db import db
+
+from conftest import StatementCounter
+
+# Summary cards, two top-5 lists, daily baskets, monthly payments
+DASHBOARD_QUERY_BUDGET = 5
+
+
+def seed_parties(count):
+    today = date.today()
+    for i in range(count):
+        wholesaler = Wholesaler(name=f'W{i}', contact_info='', mark=f'M{i}')
+        panshop = PanShop(name=f'P{i}', contact_info='')
+        db.session.add_all([wholesaler, panshop])
+        db.session.flush()
+        for party_type, party_id in (('wholesaler', wholesaler.id), ('panshop', panshop.id)):
+            db.session.add(BasketEntry(
+                party_type=party_type, party_id=party_id, date=today - timedelta(days=i % 40),
+                basket_count=2, price_per_basket=10, total_price=20, mark=f'M{i}'
+            ))
+            db.session.add(Payment(
+                party_type=party_type, party_id=party_id, amount=5,
+                date=today - timedelta(days=i % 400), payment_mode='cash'
+            ))
+    db.session.commit()
+    rebuild_balances()
+
+
+def dashboard_statements(client):
+    db.session.remove()
+    with StatementCounter(db.engine) as counter:
+        response = client.get('/api/dashboard-summary/')
+    assert response.status_code == 200
+    return counter.count, response.get_json()
+
+
+def test_dashboard_query_count_does_not_grow_with_parties(app, client):
+    seed_parties(2)
+    few, summary = dashboard_statements(client)
+    assert len(summary['top_wholesaler_dues']) == 2
+
+    seed_parties(198)
+    many, summary = dashboard_statements(client)
+    assert len(summary['top_wholesaler_dues']) == 5
+    assert summary['total_transactions'] == 800
+
+    assert few == many
+    assert many <= DASHBOARD_QUERY_BUDGET
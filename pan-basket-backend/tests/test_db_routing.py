@@ -0,0 +1,137 @@
+import shutil
+import sqlite3
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from models.models import BasketEntry, PartyBalance, Wholesaler
+from utils.balances import rebuild_balances
+from utils.db import db
+from utils.db_routing import REPLICA_BIND, get_replica_health, replica_stats
+
+from conftest import make_app
+
+
+def seed_primary(path):
+    """Create the primary schema with one wholesaler owed 20."""
+    app = make_app(path.parent, SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(Wholesaler(name='W', contact_info='', mark='M'))
+        db.session.add(BasketEntry(
+            party_type='wholesaler', party_id=1, date=date.today(),
+            basket_count=2, price_per_basket=10, total_price=20, mark='M'
+        ))
+        db.session.commit()
+        rebuild_balances()
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def databases(tmp_path):
+    primary = tmp_path / 'primary.db'
+    replica = tmp_path / 'replica.db'
+    seed_primary(primary)
+    shutil.copy(primary, replica)
+    # Make the replica distinguishable from the primary
+    with sqlite3.connect(replica) as conn:
+        conn.execute('UPDATE party_balances SET total_basket_value = 999, balance = 999')
+        conn.execute("UPDATE wholesalers SET name = 'Replica W'")
+    return primary, replica
+
+
+def replica_app(primary, replica_uri):
+    app = make_app(
+        primary.parent,
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}',
+        SQLALCHEMY_REPLICA_URI=replica_uri,
+        DB_REPLICA_HEALTH_INTERVAL=60,
+    )
+    return app
+
+
+@pytest.fixture
+def dispose_engines():
+    apps = []
+    yield apps.append
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def test_reports_read_from_the_replica(databases, dispose_engines):
+    primary, replica = databases
+    app = replica_app(primary, f'sqlite:///{replica}')
+    dispose_engines(app)
+    client = app.test_client()
+
+    assert client.get('/api/dashboard-summary/').get_json()['total_basket_value'] == 999
+    summary = client.get('/api/payments/balance-summary?party_type=wholesaler').get_json()
+    assert summary[0]['party_name'] == 'Replica W'
+
+    # Endpoints without @read_replica keep using the primary
+    assert client.get('/api/wholesalers/').get_json()[0]['name'] == 'W'
+
+    with app.app_context():
+        assert replica_stats(app)['healthy'] is True
+        stats = client.get('/api/db/pool-stats').get_json()
+        assert set(stats['pools']) == {'primary', REPLICA_BIND}
+        assert stats['pools'][REPLICA_BIND]['checkouts'] > 0
+
+
+def test_unreachable_replica_falls_back_to_the_primary(databases, dispose_engines):
+    primary, replica = databases
+    app = replica_app(primary, f"sqlite:///{primary.parent / 'missing' / 'replica.db'}")
+    dispose_engines(app)
+    client = app.test_client()
+
+    response = client.get('/api/dashboard-summary/')
+    assert response.status_code == 200
+    assert response.get_json()['total_basket_value'] == 20
+    with app.app_context():
+        assert replica_stats(app)['healthy'] is False
+
+
+def test_replica_disconnect_mid_request_retries_on_the_primary(databases, dispose_engines):
+    primary, replica = databases
+    app = replica_app(primary, f'sqlite:///{replica}')
+    dispose_engines(app)
+    client = app.test_client()
+
+    with app.app_context():
+        engine = db.engines[REPLICA_BIND]
+        health = get_replica_health(engine, app.config)
+        assert health.is_healthy()
+
+    def drop_connection(conn, cursor, statement, parameters, context, executemany):
+        # The error the SQLite dialect reports as a disconnect
+        raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+
+    event.listen(engine, 'before_cursor_execute', drop_connection)
+    try:
+        response = client.get('/api/dashboard-summary/')
+    finally:
+        event.remove(engine, 'before_cursor_execute', drop_connection)
+
+    assert response.status_code == 200
+    assert response.get_json()['total_basket_value'] == 20
+    assert health.stats()['healthy'] is False
+
+
+def test_sql_errors_on_the_replica_do_not_mark_it_down(databases, dispose_engines):
+    primary, replica = databases
+    with sqlite3.connect(replica) as conn:
+        conn.execute('DROP TABLE party_balances')
+    app = replica_app(primary, f'sqlite:///{replica}')
+    dispose_engines(app)
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    client = app.test_client()
+
+    assert client.get('/api/dashboard-summary/').status_code == 500
+    with app.app_context():
+        assert replica_stats(app)['healthy'] is True
+        assert db.session.query(PartyBalance).count() == 1
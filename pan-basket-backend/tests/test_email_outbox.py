@@ -0,0 +1,52 @@
+import smtplib
+from datetime import datetime
+
+import pytest
+
+from models.models import EmailOutbox
+from utils import email_outbox
+from utils.db import db
+from utils.email_outbox import drain_outbox, enqueue_email
+
+
+@pytest.fixture
+def outbox(app):
+    for i in range(5):
+        enqueue_email(f'user{i}@example.com', 'Subject', '<p>Body</p>')
+    db.session.commit()
+    return app
+
+
+def fake_send(monkeypatch, failures):
+    calls = []
+
+    def send(self, to_email, subject, body_html):
+        calls.append(to_email)
+        error = failures.get(len(calls))
+        if error is not None:
+            raise error
+    monkeypatch.setattr(email_outbox.SMTPSender, 'send', send)
+    return calls
+
+
+def test_connection_error_stops_the_batch(outbox, monkeypatch):
+    calls = fake_send(monkeypatch, {2: ConnectionRefusedError('refused')})
+
+    counts = drain_outbox(outbox.config)
+
+    assert len(calls) == 2
+    assert counts == {'sent': 1, 'retrying': 1, 'failed': 0, 'deferred': 3}
+    pending = EmailOutbox.query.filter_by(status='pending').order_by(EmailOutbox.id).all()
+    assert [m.attempts for m in pending] == [1, 0, 0, 0]
+    assert all(m.lock_token is None and m.next_attempt_at > datetime.utcnow() for m in pending)
+    # Nothing is due until the backoff has passed
+    assert drain_outbox(outbox.config) == {'sent': 0, 'retrying': 0, 'failed': 0, 'deferred': 0}
+
+
+def test_message_errors_do_not_stop_the_batch(outbox, monkeypatch):
+    calls = fake_send(monkeypatch, {2: smtplib.SMTPRecipientsRefused({'user1@example.com': (550, b'no')})})
+
+    counts = drain_outbox(outbox.config)
+
+    assert len(calls) == 5
+    assert counts == {'sent': 4, 'retrying': 1, 'failed': 0, 'deferred': 0}
@@ -0,0 +1,60 @@
+import pytest
+
+from models.models import BasketEntry, PartyBalance, Wholesaler
+from utils.db import db
+
+
+@pytest.fixture
+def entry(client):
+    db.session.add(Wholesaler(name='W', contact_info='', mark='M'))
+    db.session.commit()
+    response = client.post('/api/basket-entries/add', json={
+        'party_type': 'wholesaler', 'party_id': 1, 'date': '2024-01-01', 'basket_count': 2, 'price_per_basket': 10
+    })
+    assert response.status_code == 201
+    return db.session.get(BasketEntry, response.get_json()['entry']['id'])
+
+
+def balance():
+    return db.session.query(PartyBalance.total_basket_value, PartyBalance.total_paid).one()
+
+
+@pytest.mark.parametrize('changes, error', [
+    ({'total_price': 'abc'}, 'total_price must be a number'),
+    ({'total_price': 'inf'}, 'total_price must be a finite number'),
+    ({'basket_count': 2.5}, 'basket_count must be a whole number'),
+    ({'party_id': True}, 'party_id must be a number'),
+    ({'party_type': 'supplier'}, "party_type must be 'wholesaler' or 'panshop'"),
+])
+def test_update_rejects_bad_values(client, entry, changes, error):
+    response = client.put(f'/api/basket-entries/{entry.id}', json=changes)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert balance() == (20, 0)
+
+
+def test_update_moves_the_coerced_total(client, entry):
+    response = client.put(f'/api/basket-entries/{entry.id}', json={'total_price': '35.5'})
+
+    assert response.status_code == 200
+    assert balance() == (35.5, 0)
+
+
+@pytest.mark.parametrize('overrides', [{'basket_count': -1}, {'price_per_basket': 'nan'}, {'party_type': 'x'}])
+def test_add_rejects_bad_values(client, entry, overrides):
+    item = {'party_type': 'wholesaler', 'party_id': 1, 'date': '2024-01-02', 'basket_count': 1, 'price_per_basket': 5}
+    item.update(overrides)
+
+    assert client.post('/api/basket-entries/add', json=item).status_code == 400
+    assert balance() == (20, 0)
+
+
+@pytest.mark.parametrize('amount', ['nan', '-inf', -5, True])
+def test_add_payment_rejects_bad_amounts(client, entry, amount):
+    response = client.post('/api/payments/', json={
+        'party_type': 'wholesaler', 'party_id': 1, 'amount': amount, 'date': '2024-01-02', 'payment_mode': 'cash'
+    })
+
+    assert response.status_code == 400
+    assert balance() == (20, 0)
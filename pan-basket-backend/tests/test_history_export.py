@@ -0,0 +1,19 @@
+from models.models import Wholesaler
+from utils.db import db
+
+
+def test_export_rejects_unknown_party_types(client):
+    response = client.get('/api/history/export?party_type=a;b c&party_id=1&start_date=2024-01-01&end_date=2024-01-31')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "party_type must be 'wholesaler' or 'panshop'"
+
+
+def test_export_quotes_the_filename(client):
+    db.session.add(Wholesaler(name='W', contact_info='', mark='M'))
+    db.session.commit()
+
+    response = client.get('/api/history/export?party_type=wholesaler&party_id=1&start_date=2024-01-01&end_date=2024-01-31')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename="history_wholesaler_1_2024-01-01_2024-01-31.csv"'
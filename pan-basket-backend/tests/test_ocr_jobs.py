@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import time
+
+from utils.ocr_jobs import FAILED, QUEUED, RUNNING, SQLiteJobStore
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_reap_spares_queued_jobs_of_live_owners(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    store.create('waiting', owner_pid=os.getpid())
+    store.create('running', owner_pid=os.getpid())
+    store.mark_running('running')
+    store.create('stalled', owner_pid=os.getpid())
+    store.mark_running('stalled')
+    store.create('orphaned', owner_pid=dead_pid())
+    with store._connect() as conn:
+        # Everything is old; only "stalled" has been running for long
+        conn.execute('UPDATE ocr_jobs SET created_at = ?', (time.time() - 3600,))
+        conn.execute("UPDATE ocr_jobs SET started_at = ? WHERE id = 'stalled'", (time.time() - 3600,))
+
+    assert store.reap(stale_after=900) == 2
+
+    statuses = {job_id: store.get(job_id)['status'] for job_id in ('waiting', 'running', 'stalled', 'orphaned')}
+    assert statuses == {'waiting': QUEUED, 'running': RUNNING, 'stalled': FAILED, 'orphaned': FAILED}
+    assert store.mark_running('waiting')
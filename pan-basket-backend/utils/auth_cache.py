@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models.models import User
+from utils.extensions import app_extension
+
+
+class UserSnapshot:
+    """The fields of a ``User`` an authenticated request needs, detached from the session."""
+
+    __slots__ = ('id', 'username', 'email', 'is_admin', 'email_verified', 'created_at')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.is_admin = user.is_admin
+        self.email_verified = user.email_verified
+        self.created_at = user.created_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'is_admin': self.is_admin,
+            'email_verified': self.email_verified,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class TokenUserCache:
+    """Bounded LRU of verified JWT -> user snapshot.
+
+    An entry lives for ``ttl`` seconds or until the token expires, whichever
+    is sooner, and is dropped as soon as its user is invalidated. The cache is
+    per process, so in a multi-worker deployment ``ttl`` bounds how long
+    another worker can serve a stale snapshot.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tokens_by_user = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, token):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._discard(token)
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(token)
+            self._counters['hits'] += 1
+            return entry[0]
+
+    def set(self, token, snapshot, token_expires_at=None):
+        expires = time.monotonic() + self.ttl
+        if token_expires_at is not None:
+            expires = min(expires, time.monotonic() + (token_expires_at - time.time()))
+        with self._lock:
+            self._entries[token] = (snapshot, expires)
+            self._entries.move_to_end(token)
+            self._tokens_by_user.setdefault(snapshot.id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+            self._counters['invalidations'] += 1
+
+    def _discard(self, token):
+        snapshot, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(snapshot.id)
+        if tokens:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[snapshot.id]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _build_auth_cache(config):
+    return TokenUserCache(
+        max_entries=config.get('AUTH_CACHE_SIZE', 10000),
+        ttl=config.get('AUTH_CACHE_TTL', 300),
+    )
+
+
+def get_auth_cache(app=None):
+    """Return the app's token cache (default ``current_app``), building it from its config on first use."""
+    return app_extension('auth_cache', _build_auth_cache, app)
+
+
+def invalidate_user(user_id):
+    """Drop the current app's cached tokens for ``user_id``; a no-op before its cache exists."""
+    if user_id is None or not has_app_context():
+        return
+    cache = current_app.extensions.get('auth_cache')
+    if cache is not None:
+        cache.invalidate_user(user_id)
+
+
+def _remember_invalidation(user):
+    invalidate_user(user.id)
+    # Invalidate again after commit so a request that read the old row
+    # between the change and the commit can't leave it cached
+    session = object_session(user)
+    if session is not None:
+        session.info.setdefault('auth_invalidate', set()).add(user.id)
+
+
+def _on_auth_field_set(target, value, oldvalue, initiator):
+    if target.id is not None:
+        _remember_invalidation(target)
+
+
+for _attribute in (User.password_hash, User.is_admin, User.email_verified):
+    event.listen(_attribute, 'set', _on_auth_field_set)
+
+
+@event.listens_for(User, 'after_delete')
+def _on_user_delete(mapper, connection, target):
+    _remember_invalidation(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop('auth_invalidate', ()):
+        invalidate_user(user_id)
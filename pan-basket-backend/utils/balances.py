@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.models import BasketEntry, Payment, PartyBalance
+from utils.db import db
+
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def new_deltas():
+    """A ``{(party_type, party_id): [basket_delta, paid_delta]}`` accumulator."""
+    return defaultdict(lambda: [0.0, 0.0])
+
+
+def apply_balance_deltas(deltas):
+    """Add basket/paid deltas to ``party_balances`` in the current transaction.
+
+    Uses a single INSERT ... ON CONFLICT DO UPDATE where the database
+    supports it, so concurrent writers never lose an increment.
+    """
+    params = [
+        {
+            'party_type': party_type,
+            'party_id': party_id,
+            'total_basket_value': basket,
+            'total_paid': paid,
+            'balance': basket - paid,
+        }
+        for (party_type, party_id), (basket, paid) in deltas.items()
+        if basket or paid
+    ]
+    if not params:
+        return
+
+    table = PartyBalance.__table__
+    insert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.party_type, table.c.party_id],
+            set_={
+                'total_basket_value': table.c.total_basket_value + stmt.excluded.total_basket_value,
+                'total_paid': table.c.total_paid + stmt.excluded.total_paid,
+                'balance': table.c.balance + stmt.excluded.balance,
+            }
+        )
+        db.session.execute(stmt, params)
+        return
+
+    for values in params:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.party_type == values['party_type'], table.c.party_id == values['party_id'])
+            .values(
+                total_basket_value=table.c.total_basket_value + values['total_basket_value'],
+                total_paid=table.c.total_paid + values['total_paid'],
+                balance=table.c.balance + values['balance'],
+            )
+        )
+        if updated.rowcount == 0:
+            db.session.execute(table.insert().values(**values))
+
+
+def record_basket_value(party_type, party_id, amount):
+    deltas = new_deltas()
+    deltas[(party_type, party_id)][0] += float(amount)
+    apply_balance_deltas(deltas)
+
+
+def record_payment(party_type, party_id, amount):
+    deltas = new_deltas()
+    deltas[(party_type, party_id)][1] += float(amount)
+    apply_balance_deltas(deltas)
+
+
+def get_party_balance(party_type, party_id):
+    """Return ``(total_basket_value, total_paid, balance)`` for one party."""
+    row = db.session.get(PartyBalance, (party_type, party_id))
+    if not row:
+        return 0, 0, 0
+    return row.total_basket_value, row.total_paid, row.balance
+
+
+def compute_balances_from_ledger():
+    """Recompute every party's totals from the raw basket and payment tables."""
+    totals = new_deltas()
+    basket_sums = db.session.query(
+        BasketEntry.party_type, BasketEntry.party_id, func.sum(BasketEntry.total_price)
+    ).group_by(BasketEntry.party_type, BasketEntry.party_id)
+    for party_type, party_id, total in basket_sums:
+        totals[(party_type, party_id)][0] = total or 0
+
+    paid_sums = db.session.query(
+        Payment.party_type, Payment.party_id, func.sum(Payment.amount)
+    ).group_by(Payment.party_type, Payment.party_id)
+    for party_type, party_id, total in paid_sums:
+        totals[(party_type, party_id)][1] = total or 0
+
+    return totals
+
+
+def rebuild_balances():
+    """Replace the contents of ``party_balances`` with freshly computed totals."""
+    totals = compute_balances_from_ledger()
+    db.session.query(PartyBalance).delete()
+    apply_balance_deltas(totals)
+    db.session.commit()
+    return len(totals)
+
+
+def verify_balances(tolerance=0.005):
+    """Compare ``party_balances`` with the raw tables and list every mismatch."""
+    expected = compute_balances_from_ledger()
+    stored = {(b.party_type, b.party_id): b for b in PartyBalance.query.all()}
+
+    mismatches = []
+    for key in set(expected) | set(stored):
+        basket, paid = expected.get(key, (0, 0))
+        row = stored.get(key)
+        actual = (row.total_basket_value, row.total_paid, row.balance) if row else (0, 0, 0)
+        if any(abs(a - e) > tolerance for a, e in zip(actual, (basket, paid, basket - paid))):
+            mismatches.append({
+                'party_type': key[0],
+                'party_id': key[1],
+                'expected': {'total_basket_value': basket, 'total_paid': paid, 'balance': basket - paid},
+                'stored': dict(zip(('total_basket_value', 'total_paid', 'balance'), actual)),
+            })
+    return mismatches
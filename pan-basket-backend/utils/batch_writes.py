@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models.models import BasketEntry, Payment
+from utils.balances import new_deltas, apply_balance_deltas
+from utils.db import db
+from utils.parties import PARTY_MODELS, existing_party_ids
+from utils.validation import parse_number
+
+BATCH_MODES = ('atomic', 'best_effort')
+
+
+def _require(item, fields):
+    for field in fields:
+        if field not in item or item[field] in (None, ''):
+            raise ValueError(f'{field} is required')
+
+
+def basket_entry_values(item):
+    _require(item, ['party_type', 'party_id', 'date', 'basket_count', 'price_per_basket'])
+    basket_count = parse_number(item['basket_count'], 'basket_count', integer=True)
+    price_per_basket = parse_number(item['price_per_basket'], 'price_per_basket')
+    return {
+        'party_type': item['party_type'],
+        'party_id': parse_number(item['party_id'], 'party_id', integer=True),
+        'date': datetime.strptime(item['date'], '%Y-%m-%d').date(),
+        'basket_count': basket_count,
+        'price_per_basket': price_per_basket,
+        'total_price': basket_count * price_per_basket,
+        'mark': item.get('mark', ''),
+    }
+
+
+def payment_values(item):
+    _require(item, ['party_type', 'party_id', 'amount', 'date', 'payment_mode'])
+    return {
+        'party_type': item['party_type'],
+        'party_id': parse_number(item['party_id'], 'party_id', integer=True),
+        'amount': parse_number(item['amount'], 'amount'),
+        'date': datetime.strptime(item['date'], '%Y-%m-%d').date(),
+        'note': item.get('note', ''),
+        'payment_mode': item['payment_mode'],
+        'upi_account': item.get('upi_account'),
+    }
+
+
+BATCH_KINDS = {
+    'basket': (BasketEntry, basket_entry_values, 'total_price', 0),
+    'payment': (Payment, payment_values, 'amount', 1),
+}
+
+
+def write_batch(kind, items, mode='atomic'):
+    """Validate and insert a list of basket entries or payments in one transaction.
+
+    Party references are checked with one query per party type and the good
+    rows go in as a single multi-row insert. In ``atomic`` mode any invalid
+    item means nothing is written; in ``best_effort`` mode the valid items
+    are written and the rest reported. Returns ``(results, created)`` with
+    one result dict per input item, in input order.
+    """
+    model, to_values, amount_field, balance_index = BATCH_KINDS[kind]
+
+    results = [None] * len(items)
+    candidates = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('item must be an object')
+            values = to_values(item)
+            if values['party_type'] not in PARTY_MODELS:
+                raise ValueError(f"Invalid party_type '{values['party_type']}'")
+            candidates.append((index, values))
+        except (ValueError, TypeError) as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+
+    found = existing_party_ids({(values['party_type'], values['party_id']) for _, values in candidates})
+    valid = []
+    for index, values in candidates:
+        if (values['party_type'], values['party_id']) not in found:
+            results[index] = {
+                'index': index,
+                'status': 'error',
+                'error': f"{values['party_type'].capitalize()} with ID {values['party_id']} not found"
+            }
+        else:
+            valid.append((index, values))
+
+    failed = len(valid) < len(items)
+    if failed and mode == 'atomic':
+        for index, _ in valid:
+            results[index] = {'index': index, 'status': 'skipped'}
+        return results, 0
+
+    if valid:
+        rows = [values for _, values in valid]
+        if db.session.get_bind().dialect.name == 'sqlite':
+            # SQLAlchemy can only order RETURNING here by inserting row by row;
+            # SQLite hands out rowids in VALUES order, so sorting is enough
+            ids = sorted(db.session.execute(insert(model).returning(model.id), rows).scalars())
+        else:
+            ids = db.session.execute(
+                insert(model).returning(model.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+        balance_deltas = new_deltas()
+        for (index, values), new_id in zip(valid, ids):
+            balance_deltas[(values['party_type'], values['party_id'])][balance_index] += values[amount_field]
+            results[index] = {'index': index, 'status': 'created', 'id': new_id}
+        apply_balance_deltas(balance_deltas)
+        db.session.commit()
+
+    return results, len(valid)
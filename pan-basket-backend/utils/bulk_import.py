@@ -0,0 +1,215 @@
+import csv
+import io
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import insert
+
+from models.models import BasketEntry, Payment, Wholesaler, PanShop
+from utils.balances import new_deltas, apply_balance_deltas
+from utils.db import db
+from utils.ocr_ingest import parse_ledger_date
+from utils.validation import parse_number
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_KINDS = {
+    'basket': {
+        'model': BasketEntry,
+        'columns': ['party_type', 'party_id', 'date', 'basket_count', 'price_per_basket', 'total_price', 'mark'],
+    },
+    'payment': {
+        'model': Payment,
+        'columns': ['party_type', 'party_id', 'date', 'amount', 'payment_mode', 'upi_account', 'note'],
+    },
+}
+
+
+class BulkImportError(Exception):
+    """Raised for a problem with the file as a whole, such as missing columns."""
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return parse_ledger_date(value)
+
+
+class PartyDirectory:
+    """Every party id, name and mark loaded once, so rows resolve without queries."""
+
+    def __init__(self):
+        self.ids = {'wholesaler': set(), 'panshop': set()}
+        self.names = {'wholesaler': {}, 'panshop': {}}
+        self.marks = {}
+        for party_id, name, mark in db.session.query(Wholesaler.id, Wholesaler.name, Wholesaler.mark):
+            self.ids['wholesaler'].add(party_id)
+            self.names['wholesaler'].setdefault(name.strip().lower(), party_id)
+            if mark:
+                self.marks.setdefault(mark.strip(), party_id)
+        for party_id, name in db.session.query(PanShop.id, PanShop.name):
+            self.ids['panshop'].add(party_id)
+            self.names['panshop'].setdefault(name.strip().lower(), party_id)
+
+    def resolve(self, party_type, row):
+        if row.get('party_id'):
+            party_id = int(row['party_id'])
+            if party_id not in self.ids[party_type]:
+                raise ValueError(f'{party_type} with ID {party_id} not found')
+            return party_id
+        if row.get('party'):
+            party_id = self.names[party_type].get(row['party'].strip().lower())
+            if party_id is None:
+                raise ValueError(f"{party_type} named '{row['party']}' not found")
+            return party_id
+        if party_type == 'wholesaler' and row.get('mark'):
+            party_id = self.marks.get(row['mark'].strip())
+            if party_id is None:
+                raise ValueError(f"Wholesaler with mark '{row['mark']}' not found")
+            return party_id
+        raise ValueError('party_id, party or mark is required')
+
+
+def _number(row, field, integer=False):
+    return parse_number(row[field].replace(',', ''), field, integer=integer)
+
+
+def _basket_values(row, party_type, party_id):
+    basket_count = _number(row, 'basket_count', integer=True)
+    price_per_basket = _number(row, 'price_per_basket')
+    total_price = _number(row, 'total_price') if row.get('total_price') else basket_count * price_per_basket
+    return {
+        'party_type': party_type,
+        'party_id': party_id,
+        'date': _parse_date(row['date'].strip()),
+        'basket_count': basket_count,
+        'price_per_basket': price_per_basket,
+        'total_price': total_price,
+        'mark': (row.get('mark') or '').strip(),
+    }
+
+
+def _payment_values(row, party_type, party_id):
+    payment_mode = (row.get('payment_mode') or '').strip().lower()
+    if not payment_mode:
+        raise ValueError('payment_mode is required')
+    return {
+        'party_type': party_type,
+        'party_id': party_id,
+        'date': _parse_date(row['date'].strip()),
+        'amount': _number(row, 'amount'),
+        'payment_mode': payment_mode,
+        'upi_account': (row.get('upi_account') or '').strip() or None,
+        'note': (row.get('note') or '').strip(),
+    }
+
+
+def _copy_field(value):
+    # COPY csv reads an unquoted empty field as NULL and a quoted one as '',
+    # so every real value is quoted and only None is left bare
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(model, columns, rows):
+    """Load rows through PostgreSQL COPY on the session's own connection."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_copy_field(row[c]) for c in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {model.__table__.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def import_csv(stream, kind, dry_run=False):
+    """Validate and load a basket or payment CSV from a text stream.
+
+    Rows are validated as they are read and loaded in batches of
+    ``BATCH_SIZE``: with COPY on PostgreSQL, with a multi-row insert
+    elsewhere. Good rows are committed together at the end; bad rows are
+    reported by line number. ``dry_run`` validates everything and rolls back.
+    """
+    if kind not in IMPORT_KINDS:
+        raise BulkImportError(f"kind must be one of: {', '.join(IMPORT_KINDS)}")
+    model = IMPORT_KINDS[kind]['model']
+    columns = IMPORT_KINDS[kind]['columns']
+    to_values = _basket_values if kind == 'basket' else _payment_values
+    required = {'party_type', 'date'} | ({'basket_count', 'price_per_basket'} if kind == 'basket' else {'amount'})
+
+    reader = csv.DictReader(stream)
+    missing = required - set(reader.fieldnames or [])
+    if missing:
+        raise BulkImportError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    use_copy = db.session.get_bind().dialect.name == 'postgresql'
+    started = time.perf_counter()
+    parties = PartyDirectory()
+    balance_deltas = new_deltas()
+    batch = []
+    errors = []
+    error_count = 0
+    rows_read = 0
+    rows_valid = 0
+
+    def flush():
+        if batch and not dry_run:
+            if use_copy:
+                _copy_rows(model, columns, batch)
+            else:
+                db.session.execute(insert(model), batch)
+        batch.clear()
+
+    for row in reader:
+        rows_read += 1
+        try:
+            party_type = (row.get('party_type') or '').strip().lower()
+            if party_type not in ('wholesaler', 'panshop'):
+                raise ValueError(f"Invalid party_type '{row.get('party_type')}'")
+            party_id = parties.resolve(party_type, row)
+            values = to_values(row, party_type, party_id)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': reader.line_num, 'error': str(e)})
+            continue
+
+        rows_valid += 1
+        amount = values['total_price'] if kind == 'basket' else values['amount']
+        balance_deltas[(party_type, party_id)][0 if kind == 'basket' else 1] += amount
+        batch.append(values)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        apply_balance_deltas(balance_deltas)
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'kind': kind,
+        'dry_run': dry_run,
+        'method': 'copy' if use_copy else 'executemany',
+        'rows_read': rows_read,
+        'rows_valid': rows_valid,
+        'rows_inserted': 0 if dry_run else rows_valid,
+        'error_count': error_count,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(rows_read / elapsed, 1) if elapsed else None,
+    }
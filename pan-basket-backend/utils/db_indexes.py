@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+from sqlalchemy import inspect
+
+from models.models import BasketEntry, Payment, Wholesaler
+from utils.db import db
+
+
+def missing_indexes():
+    """Indexes declared on the models that the connected database doesn't have yet."""
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+def create_missing_indexes(concurrently=False):
+    """Create any missing indexes in place; tables and data are left untouched.
+
+    With ``concurrently`` on PostgreSQL the indexes are built without locking
+    out writes, which needs its own autocommit connection.
+    """
+    created = []
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for index in missing_indexes():
+            if concurrently and conn.dialect.name == 'postgresql':
+                index.dialect_options['postgresql']['concurrently'] = True
+            index.create(conn)
+            created.append(f'{index.table.name}.{index.name}')
+    # Pooled connections may hold statements planned against the old schema
+    db.engine.dispose()
+    return created
+
+
+def _hot_queries():
+    """The queries behind the busiest endpoints, with representative parameters."""
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    return {
+        'history baskets': BasketEntry.query.filter(
+            BasketEntry.party_type == 'wholesaler', BasketEntry.party_id == 1,
+            BasketEntry.date >= month_ago, BasketEntry.date <= today
+        ),
+        'history payments': Payment.query.filter(
+            Payment.party_type == 'wholesaler', Payment.party_id == 1,
+            Payment.date >= month_ago, Payment.date <= today
+        ),
+        'basket entries page': BasketEntry.query.order_by(BasketEntry.date.desc(), BasketEntry.id.desc()).limit(10),
+        'payments page': Payment.query.order_by(Payment.date.desc(), Payment.id.desc()).limit(50),
+        'basket entries by mark': BasketEntry.query.filter(BasketEntry.mark == 'MARK'),
+        'wholesalers by mark': Wholesaler.query.filter(Wholesaler.mark.in_(['MARK'])),
+    }
+
+
+def _is_sequential_scan(dialect, line):
+    if dialect == 'postgresql':
+        return 'Seq Scan' in line
+    if dialect == 'sqlite':
+        return line.startswith('SCAN') and 'USING' not in line
+    return False
+
+
+def explain_hot_queries():
+    """EXPLAIN each hot query and flag the ones that fall back to a full table scan.
+
+    Returns a list of ``{'name', 'plan', 'sequential_scan'}``. On small
+    tables PostgreSQL may pick a sequential scan even with a usable index,
+    so flags are most meaningful against production-sized data.
+    """
+    dialect = db.engine.dialect
+    prefix = 'EXPLAIN QUERY PLAN' if dialect.name == 'sqlite' else 'EXPLAIN'
+
+    report = []
+    with db.engine.connect() as conn:
+        for name, query in _hot_queries().items():
+            sql = query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+            plan = [str(row[-1]) for row in conn.execute(db.text(f'{prefix} {sql}'))]
+            report.append({
+                'name': name,
+                'plan': plan,
+                'sequential_scan': any(_is_sequential_scan(dialect.name, line.strip(' ->')) for line in plan),
+            })
+    return report
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class PoolWaitStats:
+    """How long checkouts from one pool have waited, shared across pool recreations."""
+
+    def __init__(self, slow_threshold=0.1):
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._counters = {'checkouts': 0, 'slow_checkouts': 0, 'timeouts': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    def record(self, waited, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self._counters['timeouts'] += 1
+                return
+            self._counters['checkouts'] += 1
+            self._counters['total_wait'] += waited
+            self._counters['max_wait'] = max(self._counters['max_wait'], waited)
+            if waited >= self.slow_threshold:
+                self._counters['slow_checkouts'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['avg_wait_ms'] = round(1000 * stats['total_wait'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+        stats['max_wait_ms'] = round(1000 * stats.pop('max_wait'), 3)
+        stats['total_wait_ms'] = round(1000 * stats.pop('total_wait'), 3)
+        return stats
+
+
+class TimedQueuePool(QueuePool):
+    """A ``QueuePool`` that records how long each checkout takes.
+
+    The time covers waiting for a free connection and, when the pool grows,
+    opening a new one, so a rising average means the pool is too small for
+    the load. Timeouts (pool exhausted for ``pool_timeout``) are counted too.
+    """
+
+    def __init__(self, *args, wait_stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = wait_stats or PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return record
+
+    def recreate(self):
+        # dispose() and invalidation swap in a new pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+    def stats(self):
+        stats = self.wait_stats.stats()
+        stats.update(size=self.size(), checked_out=self.checkedout(), overflow=self.overflow(), idle=self.checkedin())
+        return stats
+
+
+def engine_options(uri, config, connect_timeout=None):
+    """Pool options for an engine on ``uri`` from the ``DB_POOL_*`` settings.
+
+    In-memory SQLite keeps the single shared connection Flask-SQLAlchemy
+    gives it, so it gets no pool options.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    if connect_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'connect_timeout': connect_timeout}
+    return options
+
+
+def pool_stats(engines):
+    """Checkout wait and usage for each engine's pool, keyed by bind name."""
+    stats = {}
+    for key, engine in engines.items():
+        name = key or 'primary'
+        if isinstance(engine.pool, TimedQueuePool):
+            stats[name] = engine.pool.stats()
+        else:
+            stats[name] = {'status': engine.pool.status()}
+    return stats
@@ -0,0 +1,161 @@
+import functools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc, text
+
+from utils.db_pool import engine_options
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+
+def configure_engines(config):
+    """Fill in pool options and the replica bind from the ``DB_*`` settings.
+
+    Must run before ``db.init_app``. Options set explicitly in
+    ``SQLALCHEMY_ENGINE_OPTIONS`` or ``SQLALCHEMY_BINDS`` are left alone.
+    """
+    if not config.get('SQLALCHEMY_ENGINE_OPTIONS'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config['SQLALCHEMY_DATABASE_URI'], config)
+
+    replica_uri = config.get('SQLALCHEMY_REPLICA_URI')
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    if replica_uri and REPLICA_BIND not in binds:
+        binds[REPLICA_BIND] = dict(
+            engine_options(replica_uri, config, connect_timeout=config.get('DB_REPLICA_CONNECT_TIMEOUT', 3)),
+            url=replica_uri
+        )
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+class ReplicaHealth:
+    """Whether the replica answers, re-checked at most every ``interval`` seconds."""
+
+    def __init__(self, engine, interval=30.0):
+        self.engine = engine
+        self.interval = interval
+        self._healthy = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _stale(self):
+        return self._healthy is None or time.monotonic() - self._checked_at >= self.interval
+
+    def is_healthy(self):
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._healthy = self._ping()
+                    self._checked_at = time.monotonic()
+        return self._healthy
+
+    def _ping(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except exc.SQLAlchemyError as e:
+            logger.warning('Read replica unavailable, using the primary: %s', e)
+            # Already handled by routing to the primary; not a failure of the current view
+            if has_app_context():
+                g.pop('replica_disconnected', None)
+            return False
+        return True
+
+    def mark_down(self):
+        with self._lock:
+            self._healthy = False
+            self._checked_at = time.monotonic()
+
+    def stats(self):
+        return {
+            'healthy': self._healthy,
+            'checked_seconds_ago': round(time.monotonic() - self._checked_at, 1) if self._healthy is not None else None,
+        }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def _on_replica_error(context):
+    # Flag only connection-level failures on the replica itself: a lost
+    # connection, a failed connect, or a driver InterfaceError. SQL errors
+    # and anything raised by the primary leave the replica alone.
+    if not has_app_context():
+        return
+    if (context.is_disconnect or context.connection is None
+            or isinstance(context.sqlalchemy_exception, exc.InterfaceError)):
+        g.replica_disconnected = True
+
+
+def get_replica_health(engine, config):
+    """Return the health tracker for ``engine``, creating it on first use."""
+    health = _health.get(engine)
+    if health is None:
+        with _health_lock:
+            health = _health.get(engine)
+            if health is None:
+                health = _health[engine] = ReplicaHealth(
+                    engine, interval=config.get('DB_REPLICA_HEALTH_INTERVAL', 30)
+                )
+                event.listen(engine, 'handle_error', _on_replica_error)
+    return health
+
+
+class RoutingSession(Session):
+    """``db.session`` that sends reads to the replica inside ``read_replica`` views.
+
+    Only plain reads are routed: explicit binds and flushes always go to the
+    bind Flask-SQLAlchemy would pick, and so does everything while the
+    replica is failing its health check.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None and get_replica_health(engine, current_app.config).is_healthy():
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Run a read-only view against the replica bind when one is configured.
+
+    Results may lag the primary by the replication delay, so only use this
+    for reports. If the replica's connection fails while the view runs it is
+    marked down and the view runs again on the primary; SQL errors are
+    raised as usual.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        db = current_app.extensions['sqlalchemy']
+        if REPLICA_BIND not in db.engines:
+            return view(*args, **kwargs)
+
+        # Left set for the rest of the request so streamed responses read from the replica too
+        g.use_replica = True
+        g.replica_disconnected = False
+        try:
+            return view(*args, **kwargs)
+        except exc.DBAPIError as e:
+            if not g.pop('replica_disconnected', False):
+                raise
+            logger.warning('Read replica failed during %s, retrying on the primary: %s', view.__name__, e)
+            get_replica_health(db.engines[REPLICA_BIND], current_app.config).mark_down()
+            db.session.rollback()
+            g.use_replica = False
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def replica_stats(app):
+    """Replica health for the stats endpoint; ``None`` when no replica is configured."""
+    engine = app.extensions['sqlalchemy'].engines.get(REPLICA_BIND)
+    if engine is None:
+        return None
+    return get_replica_health(engine, app.config).stats()
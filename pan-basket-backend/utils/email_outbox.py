@@ -0,0 +1,258 @@
+import logging
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from flask import current_app, has_app_context
+
+from models.models import EmailOutbox
+from utils.db import db
+from utils.extensions import app_extension
+
+logger = logging.getLogger(__name__)
+
+# How long a drainer owns the rows it claimed before another may retry them
+CLAIM_LEASE = timedelta(minutes=5)
+
+# Errors about one message; smtplib resets the session and the connection stays usable
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+# Errors that mean the server can't be reached; the rest of the batch would only wait on it too
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+
+def _is_connection_error(e):
+    # SMTPException subclasses OSError, so a bare OSError is a socket-level failure
+    return isinstance(e, CONNECTION_ERRORS) or not isinstance(e, smtplib.SMTPException)
+
+
+def enqueue_email(to_email, subject, body_html):
+    """Add a message to the outbox in the current transaction; the caller commits."""
+    message = EmailOutbox(to_email=to_email, subject=subject, body_html=body_html)
+    db.session.add(message)
+    return message
+
+
+class SMTPSender:
+    """One SMTP connection, opened on first use and reused for every message."""
+
+    def __init__(self, host, port, user='', password='', use_tls=True, from_email='', timeout=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.from_email = from_email
+        self.timeout = timeout
+        self._server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self._server = server
+
+    def send(self, to_email, subject, body_html):
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body_html, 'html'))
+
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle connection; reconnect once and retry
+            self._connect()
+            self._server.send_message(msg)
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            host=config['EMAIL_HOST'],
+            port=config['EMAIL_PORT'],
+            user=config.get('EMAIL_USER', ''),
+            password=config.get('EMAIL_PASSWORD', ''),
+            use_tls=config.get('EMAIL_USE_TLS', True),
+            from_email=config.get('EMAIL_FROM', ''),
+            timeout=config.get('EMAIL_TIMEOUT', 30),
+        )
+
+
+def _claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages to this drainer and return them.
+
+    Rows are claimed with a conditional UPDATE on a random token, so two
+    drainers never send the same message; PostgreSQL also skips rows another
+    drainer has locked instead of waiting for them.
+    """
+    now = datetime.utcnow()
+    due = db.or_(EmailOutbox.locked_until.is_(None), EmailOutbox.locked_until < now)
+    query = db.session.query(EmailOutbox.id).filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now,
+        due
+    ).order_by(EmailOutbox.id).limit(batch_size)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    ids = [message_id for (message_id,) in query]
+    if not ids:
+        db.session.rollback()
+        return []
+
+    token = uuid.uuid4().hex
+    db.session.query(EmailOutbox).filter(EmailOutbox.id.in_(ids), due).update(
+        {'lock_token': token, 'locked_until': now + CLAIM_LEASE},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return EmailOutbox.query.filter_by(lock_token=token).order_by(EmailOutbox.id).all()
+
+
+def _release(messages, retry_at):
+    """Hand claimed messages back untried, due again at ``retry_at``; returns how many."""
+    for message in messages:
+        message.next_attempt_at = retry_at
+        message.lock_token = None
+        message.locked_until = None
+    db.session.commit()
+    return len(messages)
+
+
+def drain_outbox(config, batch_size=None):
+    """Send one batch of due messages over a single SMTP connection.
+
+    Failed sends are retried with exponential backoff until
+    ``EMAIL_OUTBOX_MAX_ATTEMPTS``, then marked failed. If the server can't
+    be reached the batch stops there: the rest of it is released untried
+    and held back for one backoff period. Returns
+    ``{'sent': n, 'retrying': n, 'failed': n, 'deferred': n}``.
+    """
+    batch_size = batch_size or config.get('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    max_attempts = config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    backoff = config.get('EMAIL_OUTBOX_BACKOFF', 30)
+
+    counts = {'sent': 0, 'retrying': 0, 'failed': 0, 'deferred': 0}
+    messages = _claim_batch(batch_size)
+    if not messages:
+        return counts
+
+    sender = SMTPSender.from_config(config)
+    try:
+        for position, message in enumerate(messages):
+            connection_lost = False
+            try:
+                sender.send(message.to_email, message.subject, message.body_html)
+            except (smtplib.SMTPException, OSError) as e:
+                connection_lost = _is_connection_error(e)
+                if not isinstance(e, MESSAGE_ERRORS):
+                    # Drop a broken connection so the next message starts clean
+                    sender.close()
+                message.attempts += 1
+                message.last_error = str(e)
+                if message.attempts >= max_attempts:
+                    message.status = 'failed'
+                    counts['failed'] += 1
+                else:
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff * 2 ** (message.attempts - 1))
+                    counts['retrying'] += 1
+                logger.warning('Email %s to %s failed (attempt %s): %s', message.id, message.to_email, message.attempts, e)
+            else:
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                counts['sent'] += 1
+            message.lock_token = None
+            message.locked_until = None
+            # Record each outcome at once so a crash can't resend delivered mail
+            db.session.commit()
+            if connection_lost:
+                counts['deferred'] = _release(messages[position + 1:], datetime.utcnow() + timedelta(seconds=backoff))
+                break
+    finally:
+        sender.close()
+    return counts
+
+
+class OutboxWorker:
+    """Background thread that drains the outbox until it is empty, then sleeps.
+
+    ``wake`` cuts the sleep short, so mail queued by a request goes out
+    straight away rather than on the next poll.
+    """
+
+    def __init__(self, app, poll_interval=5):
+        self.app = app
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.is_running():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    while not self._stop.is_set():
+                        counts = drain_outbox(self.app.config)
+                        # Nothing due, or the server is unreachable: wait for the next poll
+                        if not any(counts.values()) or counts['deferred']:
+                            break
+            except Exception:
+                logger.exception('Email outbox drain failed')
+            self._wake.wait(self.poll_interval)
+
+
+_worker_lock = threading.Lock()
+
+
+def ensure_outbox_worker(app):
+    """Start ``app``'s outbox worker unless it is already running."""
+    worker = app_extension(
+        'email_outbox_worker',
+        lambda config: OutboxWorker(app, poll_interval=config.get('EMAIL_OUTBOX_POLL_INTERVAL', 5)),
+        app
+    )
+    if not worker.is_running():
+        with _worker_lock:
+            worker.start()
+    return worker
+
+
+def wake_outbox_worker():
+    """Ask the current app's worker to drain now; a no-op when it has none running."""
+    worker = current_app.extensions.get('email_outbox_worker') if has_app_context() else None
+    if worker is not None:
+        worker.wake()
@@ -0,0 +1,31 @@
+import os
+import threading
+
+from flask import current_app
+
+_lock = threading.RLock()
+
+
+def app_extension(name, factory, app=None):
+    """Return ``app.extensions[name]``, building it with ``factory(app.config)`` on first use.
+
+    ``app`` defaults to ``current_app``. Each app made by ``create_app``
+    gets its own instance, configured from its own settings.
+    """
+    app = app or current_app._get_current_object()
+    extension = app.extensions.get(name)
+    if extension is None:
+        # Reentrant: one extension's factory may look up another
+        with _lock:
+            extension = app.extensions.get(name)
+            if extension is None:
+                extension = app.extensions[name] = factory(app.config)
+    return extension
+
+
+def _reset_after_fork():
+    global _lock
+    _lock = threading.RLock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
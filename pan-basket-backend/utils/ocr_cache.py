@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from utils.extensions import app_extension
+
+
+class OCRResultCache:
+    """Two-level cache of OCR results keyed by image content and settings.
+
+    The first level is an in-memory LRU. The second level is a directory of
+    JSON files that is shared by workers and survives restarts; it is trimmed
+    oldest-first once it grows past ``max_disk_bytes``.
+    """
+
+    def __init__(self, max_entries=256, directory=None, max_disk_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_bytes, settings):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._counters['stores'] += 1
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                value = json.load(f)
+            # Touch so trimming treats it as recently used
+            os.utime(self._path(key))
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.directory:
+            return
+        tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            return
+
+        # Only rescan the directory once our running estimate crosses the cap
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+            needs_scan = self._disk_bytes is None or self._disk_bytes > self.max_disk_bytes
+        if needs_scan:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._counters['evictions'] += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _build_ocr_cache(config):
+    return OCRResultCache(
+        max_entries=config.get('OCR_CACHE_SIZE', 256),
+        directory=config.get('OCR_CACHE_DIR') or None,
+        max_disk_bytes=config.get('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+    )
+
+
+def get_ocr_cache(app=None):
+    """Return the app's OCR result cache (default ``current_app``), building it from its config on first use."""
+    return app_extension('ocr_cache', _build_ocr_cache, app)
+
+
+def ocr_cache_settings(config, preprocessing):
+    """Everything besides the image bytes that can change the OCR output."""
+    return {
+        'format': 'rows-v1',
+        'languages': list(config.get('OCR_LANGUAGES', ['en'])),
+        'preprocessing': preprocessing,
+    }
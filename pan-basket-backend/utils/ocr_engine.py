@@ -0,0 +1,20 @@
+import time
+
+from utils.image_preprocessing import preprocess_image
+from utils.ocr_rows import reconstruct
+
+
+def recognize(reader, image_bytes, preprocessing):
+    """Preprocess raw image bytes and run them through an EasyOCR reader."""
+    image, timings = preprocess_image(image_bytes, **preprocessing)
+
+    start = time.perf_counter()
+    detections = reader.readtext(image, detail=1)
+    timings['ocr_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    start = time.perf_counter()
+    result = reconstruct(detections)
+    timings['rows_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    result['timings'] = timings
+    return result
@@ -0,0 +1,174 @@
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import insert
+
+from models.models import BasketEntry, Wholesaler, PanShop
+from utils.balances import new_deltas, apply_balance_deltas
+from utils.db import db
+
+DATE_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y"]
+
+
+@lru_cache(maxsize=4096)
+def parse_ledger_date(date_str):
+    """Parse a hand-written ledger date such as 21-07-2025 or 21/7/25.
+
+    Raises ValueError when the string can't be read as a day-first date.
+    Memoized because a ledger page repeats the same few dates on every row.
+    """
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+
+    # Try to handle year format like "2025" without leading zeros
+    parts = date_str.replace('-', '/').replace('.', '/').split('/')
+    if len(parts) == 3:
+        try:
+            day = int(parts[0])
+            month = int(parts[1])
+            year = int(parts[2])
+            if year < 100:  # Assume 2-digit year
+                year += 2000
+            return datetime(year, month, day).date()
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Could not parse date parts: {parts}. Error: {str(e)}")
+
+    raise ValueError(f"Could not parse date: {date_str}")
+
+
+def _resolve_wholesalers(marks, auto_create):
+    """Map each mark to a wholesaler with one IN query.
+
+    Returns ``(by_mark, failed)`` where ``failed`` maps marks whose
+    auto-creation failed to the error message.
+    """
+    by_mark = {}
+    if marks:
+        found = Wholesaler.query.filter(Wholesaler.mark.in_(marks)).order_by(Wholesaler.id).all()
+        for wholesaler in found:
+            by_mark.setdefault(wholesaler.mark, wholesaler)
+
+    failed = {}
+    missing = [mark for mark in marks if mark not in by_mark]
+    if missing and auto_create:
+        created = {mark: _new_wholesaler(mark) for mark in missing}
+        try:
+            # A savepoint, so a failure here leaves the caller's pending work alone
+            with db.session.begin_nested():
+                db.session.add_all(created.values())  # flushed on release to get the IDs
+        except Exception:
+            # Retry one mark at a time so only the marks that really fail are reported
+            for mark in missing:
+                wholesaler = _new_wholesaler(mark)
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(wholesaler)
+                except Exception as e:
+                    failed[mark] = str(e)
+                else:
+                    by_mark[mark] = wholesaler
+        else:
+            by_mark.update(created)
+    return by_mark, failed
+
+
+def _new_wholesaler(mark):
+    return Wholesaler(name=f"Auto-created: {mark}", mark=mark, contact_info="")
+
+
+def ingest_rows(rows, transaction_type, pan_shop_id, auto_create_wholesaler=False):
+    """Validate OCR rows and insert the good ones as basket entries in bulk.
+
+    Returns ``(inserted, errors)``: the accepted input rows and one message
+    per rejected row. Nothing is committed; the caller owns the transaction.
+    """
+    inserted = []
+    errors = []
+    candidates = []
+
+    for index, row in enumerate(rows):
+        try:
+            # Validate required fields
+            if not row.get('amount'):
+                errors.append((index, f"Missing amount in row: {row}"))
+                continue
+
+            if not row.get('mark') and transaction_type == 'wholesaler':
+                errors.append((index, f"Missing mark in row: {row}"))
+                continue
+
+            if not row.get('date'):
+                errors.append((index, f"Missing date in row: {row}"))
+                continue
+
+            # Convert amount to float
+            try:
+                amount = float(str(row.get('amount', '0')).replace(',', ''))
+            except ValueError as e:
+                errors.append((index, f"Invalid amount format in row: {row}. Error: {str(e)}"))
+                continue
+
+            mark = row.get('mark', '').strip()
+            date_str = row.get('date', '').strip()
+            candidates.append((index, row, amount, mark, date_str))
+        except Exception as e:
+            errors.append((index, f"Error processing row '{row}': {str(e)}"))
+
+    if transaction_type == "wholesaler":
+        marks = list(dict.fromkeys(mark for _, _, _, mark, _ in candidates))
+        wholesalers, failed_marks = _resolve_wholesalers(marks, auto_create_wholesaler)
+    elif transaction_type == "panshop":
+        # Use selected pan shop, allow any mark
+        pan_shop = PanShop.query.filter_by(id=pan_shop_id).first()
+
+    entries = []
+    for index, row, amount, mark, date_str in candidates:
+        if transaction_type == "wholesaler":
+            if mark in failed_marks:
+                errors.append((index, f"Failed to create wholesaler with mark '{mark}': {failed_marks[mark]}"))
+                continue
+            party = wholesalers.get(mark)
+            if not party:
+                errors.append((index, f"Wholesaler with mark '{mark}' not found for row: {row}"))
+                continue
+        elif transaction_type == "panshop":
+            party = pan_shop
+            if not party:
+                errors.append((index, f"Pan Shop with ID '{pan_shop_id}' not found for row: {row}"))
+                continue
+        else:
+            errors.append((index, f"Invalid transaction type '{transaction_type}' for row: {row}"))
+            continue
+
+        try:
+            date = parse_ledger_date(date_str)
+        except Exception as e:
+            errors.append((index, f"Invalid date format in row: {row}. Error: {str(e)}"))
+            continue
+
+        entries.append({
+            'party_type': transaction_type,
+            'party_id': party.id,
+            'date': date,
+            'basket_count': 1,
+            'price_per_basket': amount,
+            'total_price': amount,
+            'mark': mark
+        })
+        inserted.append(row)
+
+    if entries:
+        # One executemany instead of an ORM object per row
+        db.session.execute(insert(BasketEntry), entries)
+
+        balance_deltas = new_deltas()
+        for entry in entries:
+            balance_deltas[(entry['party_type'], entry['party_id'])][0] += entry['total_price']
+        apply_balance_deltas(balance_deltas)
+
+    # Report errors in input order, as the row-by-row loop used to
+    errors.sort(key=lambda error: error[0])
+    return inserted, [message for _, message in errors]
@@ -0,0 +1,386 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+from flask import current_app
+
+from utils.extensions import app_extension
+from utils.image_preprocessing import preprocessing_options
+from utils.ocr_cache import get_ocr_cache, ocr_cache_settings
+from utils.ocr_engine import recognize
+from utils.ocr_pool import ReaderPool
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+
+class InMemoryJobStore:
+    """Job records kept in this process only. Fine for a single worker."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, owner_pid=None):
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': QUEUED,
+                'created_at': now,
+                'updated_at': now,
+                'started_at': None,
+                'result': None,
+                'error': None,
+            }
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, status, result=None, error=None, only_from=None):
+        """Set a job's status, optionally only if it is currently in ``only_from``."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or (only_from and job['status'] not in only_from):
+                return False
+            job.update(status=status, result=result, error=error, updated_at=time.time())
+            return True
+
+    def mark_running(self, job_id):
+        """Move a queued job to running; False if it was cancelled or is unknown."""
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job['status'] != QUEUED:
+                return False
+            job.update(status=RUNNING, started_at=now, updated_at=now)
+            return True
+
+    def reap(self, stale_after):
+        # Jobs live and die with this process, so none can be orphaned
+        return 0
+
+    def prune(self, max_age):
+        cutoff = time.time() - max_age
+        with self._lock:
+            for job_id in [j['id'] for j in self._jobs.values()
+                           if j['status'] in FINISHED_STATUSES and j['updated_at'] < cutoff]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job records in a local SQLite file, readable from every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS ocr_jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' updated_at REAL NOT NULL,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' started_at REAL,'
+                ' owner_pid INTEGER)'
+            )
+            # Files created before jobs recorded when they started and who submitted them
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(ocr_jobs)')}
+            for column, kind in (('started_at', 'REAL'), ('owner_pid', 'INTEGER')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE ocr_jobs ADD COLUMN {column} {kind}')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id, owner_pid=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO ocr_jobs (id, status, created_at, updated_at, owner_pid) VALUES (?, ?, ?, ?, ?)',
+                (job_id, QUEUED, now, now, owner_pid),
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, status, created_at, updated_at, result, error, started_at FROM ocr_jobs WHERE id = ?',
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'status': row[1],
+            'created_at': row[2],
+            'updated_at': row[3],
+            'result': json.loads(row[4]) if row[4] else None,
+            'error': row[5],
+            'started_at': row[6],
+        }
+
+    def update(self, job_id, status, result=None, error=None, only_from=None):
+        sql = 'UPDATE ocr_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?'
+        params = [status, json.dumps(result) if result is not None else None, error, time.time(), job_id]
+        if only_from:
+            sql += ' AND status IN ({})'.format(', '.join('?' * len(only_from)))
+            params.extend(only_from)
+        with self._connect() as conn:
+            return conn.execute(sql, params).rowcount > 0
+
+    def mark_running(self, job_id):
+        """Move a queued job to running; False if it was cancelled or is unknown."""
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                'UPDATE ocr_jobs SET status = ?, started_at = ?, updated_at = ? WHERE id = ? AND status = ?',
+                (RUNNING, now, now, job_id, QUEUED),
+            ).rowcount > 0
+
+    def reap(self, stale_after):
+        """Fail unfinished jobs whose submitting process is gone, and stalled running jobs.
+
+        The image bytes only ever lived in the submitting process, so an
+        orphaned job can't be requeued. A job counts as stalled once it has
+        been running for ``stale_after`` seconds; queued jobs of a live
+        process are left alone however long they wait. Returns the number
+        of jobs failed.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            owners = [row[0] for row in conn.execute(
+                'SELECT DISTINCT owner_pid FROM ocr_jobs WHERE status IN (?, ?) AND owner_pid IS NOT NULL',
+                (QUEUED, RUNNING),
+            )]
+            dead = [pid for pid in owners if not _process_alive(pid)]
+            reaped = 0
+            if dead:
+                reaped += conn.execute(
+                    'UPDATE ocr_jobs SET status = ?, error = ?, updated_at = ?'
+                    ' WHERE status IN (?, ?) AND owner_pid IN ({})'.format(', '.join('?' * len(dead))),
+                    (FAILED, 'The process running this job exited before it finished', now, QUEUED, RUNNING, *dead),
+                ).rowcount
+            reaped += conn.execute(
+                'UPDATE ocr_jobs SET status = ?, error = ?, updated_at = ?'
+                ' WHERE status = ? AND started_at < ?',
+                (FAILED, 'OCR job stalled', now, RUNNING, now - stale_after),
+            ).rowcount
+        return reaped
+
+    def prune(self, max_age):
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM ocr_jobs WHERE status IN (?, ?, ?) AND updated_at < ?',
+                (*FINISHED_STATUSES, time.time() - max_age),
+            )
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobNotRunnable(Exception):
+    """The job was cancelled or reaped before a worker picked it up."""
+
+
+# --- Worker process side ---
+
+_worker_pool = None
+_worker_stores = {}
+
+
+def _init_worker(languages, gpu, threads):
+    global _worker_pool
+    if threads:
+        # Keep N worker processes from each spawning a thread per core
+        import torch
+        torch.set_num_threads(threads)
+    _worker_pool = ReaderPool(size=1, languages=languages, gpu=gpu)
+
+
+def run_ocr(image_bytes, preprocessing, job_id=None, store_path=None):
+    """Run OCR on raw image bytes inside a worker process.
+
+    With ``store_path`` the job is marked running in the shared store first,
+    so every web worker sees it, and a job cancelled meanwhile is skipped.
+    """
+    if store_path is not None:
+        store = _worker_stores.get(store_path)
+        if store is None:
+            store = _worker_stores[store_path] = SQLiteJobStore(store_path)
+        if not store.mark_running(job_id):
+            raise JobNotRunnable(job_id)
+    with _worker_pool.reader() as reader:
+        return recognize(reader, image_bytes, preprocessing)
+
+
+# --- Web process side ---
+
+class OCRJobQueue:
+    """Submits OCR work to a process pool and tracks it in a job store."""
+
+    def __init__(self, store, workers=1, languages=('en',), gpu=False, job_ttl=3600, start_method='spawn',
+                 preprocessing=None, cache=None, cache_settings=None, stale_after=900):
+        self.store = store
+        self.job_ttl = job_ttl
+        self.stale_after = stale_after
+        # Worker processes can only report progress to a store they can open themselves
+        self._store_path = store.path if isinstance(store, SQLiteJobStore) else None
+        self.preprocessing = preprocessing or {}
+        self.cache = cache
+        self.cache_settings = cache_settings or {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        workers = max(1, int(workers))
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(list(languages), gpu, max(1, (os.cpu_count() or 1) // workers)),
+        )
+        # Jobs left behind by a process that died (e.g. a restarted gunicorn worker)
+        self.store.reap(stale_after)
+
+    def _cache_key(self, image_bytes):
+        if self.cache is None:
+            return None
+        return self.cache.make_key(image_bytes, self.cache_settings)
+
+    def _cached(self, cache_key):
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        return dict(cached, cached=True) if cached is not None else None
+
+    def _remember(self, cache_key, result):
+        if cache_key is not None:
+            self.cache.set(cache_key, {k: v for k, v in result.items() if k != 'timings'})
+        return dict(result, cached=False)
+
+    def submit(self, image_bytes):
+        self.store.prune(self.job_ttl)
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, owner_pid=os.getpid())
+
+        cache_key = self._cache_key(image_bytes)
+        cached = self._cached(cache_key)
+        if cached is not None:
+            self.store.update(job_id, DONE, result=cached)
+            return job_id
+
+        future = self._executor.submit(run_ocr, image_bytes, self.preprocessing, job_id, self._store_path)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, cache_key, f))
+        return job_id
+
+    def run_batch(self, images, timeout=None):
+        """OCR several images in parallel and return one result per image, in order.
+
+        Each result is ``{'text': ...}`` on success or ``{'error': ...}`` on failure,
+        so one unreadable page doesn't sink the rest of the batch.
+        """
+        cache_keys = [self._cache_key(image_bytes) for image_bytes in images]
+        results = [self._cached(cache_key) for cache_key in cache_keys]
+        futures = {
+            index: self._executor.submit(run_ocr, image_bytes, self.preprocessing)
+            for index, image_bytes in enumerate(images)
+            if results[index] is None
+        }
+        wait(futures.values(), timeout=timeout)
+
+        for index, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[index] = {'error': 'OCR timed out'}
+            elif future.exception() is not None:
+                results[index] = {'error': str(future.exception())}
+            else:
+                results[index] = self._remember(cache_keys[index], future.result())
+        return results
+
+    def _on_done(self, job_id, cache_key, future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.store.update(job_id, FAILED, error=str(error), only_from=(QUEUED, RUNNING))
+        else:
+            result = self._remember(cache_key, future.result())
+            self.store.update(job_id, DONE, result=result, only_from=(QUEUED, RUNNING))
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        if job and job['status'] == QUEUED and self._store_path is None:
+            # The in-memory store can't be updated from the worker process
+            with self._lock:
+                future = self._futures.get(job_id)
+            if future is not None and future.running():
+                job['status'] = RUNNING
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job that has not finished. Returns False if it already has."""
+        if not self.store.update(job_id, CANCELLED, only_from=(QUEUED, RUNNING)):
+            return False
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+        if future is not None:
+            # A job that already started keeps running, but its result is discarded
+            future.cancel()
+        return True
+
+
+def get_job_queue(app=None):
+    """Return the app's OCR job queue (default ``current_app``), building it from its config on first use."""
+    app = app or current_app._get_current_object()
+
+    def build(config):
+        if config.get('OCR_JOB_BACKEND', 'memory') == 'sqlite':
+            store = SQLiteJobStore(config['OCR_JOB_DB'])
+        else:
+            store = InMemoryJobStore()
+        return OCRJobQueue(
+            store,
+            workers=config.get('OCR_JOB_WORKERS', 1),
+            languages=config.get('OCR_LANGUAGES', ['en']),
+            gpu=config.get('OCR_GPU', False),
+            job_ttl=config.get('OCR_JOB_TTL', 3600),
+            stale_after=config.get('OCR_JOB_STALE_AFTER', 900),
+            preprocessing=preprocessing_options(config),
+            cache=get_ocr_cache(app),
+            cache_settings=ocr_cache_settings(config, preprocessing_options(config)),
+        )
+
+    return app_extension('ocr_job_queue', build, app)
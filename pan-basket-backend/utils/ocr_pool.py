@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from utils.extensions import app_extension
+
+
+class ReaderPoolTimeout(Exception):
+    """Raised when no OCR reader becomes free within the checkout timeout."""
+
+
+class ReaderPool:
+    """A fixed-size pool of pre-loaded EasyOCR readers.
+
+    Readers are created lazily up to ``size`` and handed out one request at a
+    time, so model loading is paid once per reader instead of once per upload.
+    """
+
+    def __init__(self, size=1, languages=('en',), gpu=False, torch_threads=0):
+        self.size = max(1, int(size))
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.torch_threads = torch_threads
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _create_reader(self):
+        # Imported here so processes that never run OCR don't load torch
+        import easyocr
+        if self.torch_threads:
+            # torch was just loaded in this process, so post_fork couldn't set this
+            import torch
+            torch.set_num_threads(self.torch_threads)
+        return easyocr.Reader(self.languages, gpu=self.gpu)
+
+    def _try_grow(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            return self._create_reader()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def warm_up(self):
+        """Load every reader up front so the first requests don't pay for it."""
+        while True:
+            reader = self._try_grow()
+            if reader is None:
+                break
+            self._idle.put(reader)
+
+    @contextmanager
+    def reader(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            reader = self._idle.get_nowait()
+        except queue.Empty:
+            reader = self._try_grow()
+            if reader is None:
+                try:
+                    reader = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise ReaderPoolTimeout(f'No OCR reader available after {timeout}s')
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        try:
+            yield reader
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(reader)
+
+    def idle_readers(self):
+        """The readers currently checked in; only meaningful while the pool is quiet."""
+        return list(self._idle.queue)
+
+    def _after_fork(self):
+        # A forked child inherits the readers but none of the parent's
+        # checkouts, and a lock the parent held would never be released here
+        readers = self.idle_readers()
+        self._idle = queue.LifoQueue()
+        for reader in readers:
+            self._idle.put(reader)
+        self._lock = threading.Lock()
+        self._created = len(readers)
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'total_wait_ms': round(self._total_wait * 1000, 3),
+                'avg_wait_ms': round(self._total_wait * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+            }
+
+
+_pools = weakref.WeakSet()
+
+
+def _build_reader_pool(config):
+    pool = ReaderPool(
+        size=config.get('OCR_READER_POOL_SIZE', 1),
+        languages=config.get('OCR_LANGUAGES', ['en']),
+        gpu=config.get('OCR_GPU', False),
+        torch_threads=config.get('OCR_TORCH_THREADS', 0),
+    )
+    _pools.add(pool)
+    return pool
+
+
+def get_reader_pool(app=None):
+    """Return the app's reader pool (default ``current_app``), building it from its config on first use."""
+    return app_extension('ocr_reader_pool', _build_reader_pool, app)
+
+
+def _reset_after_fork():
+    for pool in list(_pools):
+        pool._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,101 @@
+import gc
+import os
+import sys
+
+from utils.ocr_pool import get_reader_pool
+
+SMAPS_FIELDS = {
+    'Rss': 'rss_kb',
+    'Pss': 'pss_kb',
+    'Shared_Clean': 'shared_clean_kb',
+    'Shared_Dirty': 'shared_dirty_kb',
+    'Private_Clean': 'private_clean_kb',
+    'Private_Dirty': 'private_dirty_kb',
+    'Swap': 'swap_kb',
+}
+
+_preloaded = False
+
+
+def _torch_modules(reader):
+    for name in ('detector', 'recognizer'):
+        module = getattr(reader, name, None)
+        if module is not None and hasattr(module, 'share_memory'):
+            yield module
+
+
+def preload_ocr_models(app):
+    """Load every OCR reader of ``app`` in this (master) process so forked workers share them.
+
+    The weights are moved into shared memory, so they stay shared even if
+    the allocator or an in-place op touches their pages. The gc is then
+    frozen so collections in the workers don't write to the object headers
+    of everything loaded here. Must run before any worker is forked and
+    before torch has started its thread pool, i.e. without running inference.
+    """
+    global _preloaded
+    pool = get_reader_pool(app)
+    pool.warm_up()
+    for reader in pool.idle_readers():
+        for module in _torch_modules(reader):
+            module.eval()
+            module.requires_grad_(False)
+            module.share_memory()
+
+    gc.collect()
+    gc.freeze()
+    _preloaded = True
+    return pool
+
+
+def is_preloaded():
+    return _preloaded
+
+
+def init_ocr_worker(torch_threads=0):
+    """Per-worker setup after fork: give each worker its own torch thread budget.
+
+    Only applies when torch was preloaded; otherwise the reader pool sets
+    the thread count when it first imports torch.
+    """
+    if torch_threads and 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(torch_threads)
+
+
+def process_memory(pid='self'):
+    """Shared vs unique memory of a process from ``/proc/<pid>/smaps_rollup``.
+
+    ``unique_kb`` is what the process alone holds (private pages); shared
+    pages are also mapped by its siblings. Returns None where smaps_rollup
+    isn't available (non-Linux or kernels before 4.14).
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    memory = {'pid': os.getpid() if pid == 'self' else int(pid)}
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in SMAPS_FIELDS:
+            memory[SMAPS_FIELDS[key]] = int(value.split()[0])
+    memory['shared_kb'] = memory.get('shared_clean_kb', 0) + memory.get('shared_dirty_kb', 0)
+    memory['unique_kb'] = memory.get('private_clean_kb', 0) + memory.get('private_dirty_kb', 0)
+    return memory
+
+
+def worker_memory_report(master_pid):
+    """``process_memory`` for a gunicorn master and each of its workers."""
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            children = [int(pid) for pid in f.read().split()]
+    except OSError:
+        children = []
+    report = []
+    for role, pid in [('master', master_pid)] + [('worker', pid) for pid in children]:
+        memory = process_memory(pid)
+        if memory is not None:
+            memory['role'] = role
+            report.append(memory)
+    return report
@@ -0,0 +1,95 @@
+import re
+from statistics import median
+
+DATE_PATTERN = re.compile(r'\b\d{1,2}\s*[-./]\s*\d{1,2}\s*[-./]\s*\d{2,4}\b')
+AMOUNT_PATTERN = re.compile(r'^\d[\d,]*(?:\.\d+)?$')
+MARK_PATTERN = re.compile(r'^[A-Za-z0-9]+$')
+WHITESPACE = re.compile(r'\s+')
+
+
+def _box(detection):
+    points, text, confidence = detection
+    xs = [float(p[0]) for p in points]
+    ys = [float(p[1]) for p in points]
+    return {
+        'text': str(text).strip(),
+        'confidence': float(confidence),
+        'x0': min(xs),
+        'y0': min(ys),
+        'y1': max(ys),
+        'yc': (min(ys) + max(ys)) / 2,
+    }
+
+
+def group_rows(detections):
+    """Cluster EasyOCR ``detail=1`` detections into lines, left to right.
+
+    A box joins the current line when its vertical centre is within half a
+    typical box height of the line's centre, so one ledger row split into
+    several boxes comes back together.
+    """
+    boxes = [_box(d) for d in detections]
+    boxes = [b for b in boxes if b['text']]
+    if not boxes:
+        return []
+
+    tolerance = median(b['y1'] - b['y0'] for b in boxes) / 2
+    lines = []
+    for box in sorted(boxes, key=lambda b: b['yc']):
+        if lines and abs(box['yc'] - lines[-1]['yc']) <= tolerance:
+            line = lines[-1]
+            line['boxes'].append(box)
+            line['yc'] = sum(b['yc'] for b in line['boxes']) / len(line['boxes'])
+        else:
+            lines.append({'yc': box['yc'], 'boxes': [box]})
+
+    return [sorted(line['boxes'], key=lambda b: b['x0']) for line in lines]
+
+
+def parse_row(boxes):
+    """Pick amount, mark and date out of one line of boxes.
+
+    Returns None when the line has no amount or mark, the same rule the
+    OCR upload page used when it parsed the flat text itself.
+    """
+    raw = ' '.join(b['text'] for b in boxes)
+
+    date = ''
+    remainder = raw
+    date_match = DATE_PATTERN.search(raw)
+    if date_match:
+        date = WHITESPACE.sub('', date_match.group())
+        remainder = raw[:date_match.start()] + ' ' + raw[date_match.end():]
+
+    amount = ''
+    mark = ''
+    extra = []
+    for token in remainder.split():
+        if not amount and AMOUNT_PATTERN.match(token):
+            amount = token
+        elif amount and not mark and MARK_PATTERN.match(token):
+            mark = token
+        else:
+            extra.append(token)
+
+    if not amount or not mark:
+        return None
+
+    return {
+        'amount': amount,
+        'mark': mark,
+        'date': date,
+        'extra': ' '.join(extra),
+        'raw': raw,
+        'confidence': round(min(b['confidence'] for b in boxes), 3),
+    }
+
+
+def reconstruct(detections):
+    """Turn raw detections into the joined text and the parsed ledger rows."""
+    lines = group_rows(detections)
+    rows = [row for row in (parse_row(line) for line in lines) if row]
+    return {
+        'text': "\n".join(' '.join(b['text'] for b in line) for line in lines),
+        'rows': rows,
+    }
@@ -0,0 +1,65 @@
+import base64
+import json
+
+from sqlalchemy import and_, or_, text
+
+
+def encode_cursor(values):
+    """Pack the sort key of the last row on a page into an opaque token."""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Unpack a token from ``encode_cursor`` holding ``size`` sort values.
+
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def after_cursor(columns, values, descending):
+    """Keyset condition selecting rows that sort strictly after ``values``.
+
+    ``columns`` is the full ORDER BY key (ending in a unique column) and all
+    of it runs in the same direction.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        step = column < values[i] if descending else column > values[i]
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def parse_limit(value, default=50, maximum=500):
+    """Read a ``limit`` query parameter, clamped to ``1..maximum``."""
+    if value is None:
+        return default
+    limit = int(value)
+    return max(1, min(limit, maximum))
+
+
+def estimate_count(query):
+    """Approximate row count for ``query`` from the planner instead of a COUNT scan.
+
+    Uses PostgreSQL's EXPLAIN estimate; other databases fall back to an
+    exact count. Returns ``(count, is_estimate)``.
+    """
+    session = query.session
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return query.order_by(None).count(), False
+
+    sql = query.order_by(None).statement.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})
+    plan = session.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows']), True
@@ -0,0 +1,25 @@
+from models.models import Wholesaler, PanShop
+
+PARTY_MODELS = {
+    'wholesaler': Wholesaler,
+    'panshop': PanShop,
+}
+
+
+def existing_party_ids(refs):
+    """Return the ``(party_type, party_id)`` pairs from ``refs`` that exist.
+
+    Runs one ``IN`` query per party type however many references there are.
+    """
+    wanted = {}
+    for party_type, party_id in refs:
+        wanted.setdefault(party_type, set()).add(party_id)
+
+    found = set()
+    for party_type, ids in wanted.items():
+        model = PARTY_MODELS.get(party_type)
+        if model is None:
+            continue
+        for (party_id,) in model.query.with_entities(model.id).filter(model.id.in_(ids)):
+            found.add((party_type, party_id))
+    return found
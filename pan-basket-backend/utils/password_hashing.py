@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from utils.extensions import app_extension
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; the caller should answer 503."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded thread pool.
+
+    hashlib releases the GIL while it hashes, so ``workers`` threads keep that
+    many cores busy. At most ``max_pending`` hashes may be running or queued;
+    past that ``hash`` and ``verify`` raise ``PasswordHasherBusy`` at once
+    instead of piling up requests behind a login burst.
+    """
+
+    def __init__(self, method='pbkdf2:sha256:600000', workers=None, max_pending=32, timeout=10.0):
+        self.method = method
+        self.timeout = timeout
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(self.workers + max_pending)
+        # The prefix werkzeug writes for this method, with defaults filled in
+        self._prefix = generate_password_hash('', method).split('$', 1)[0]
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many password checks in progress')
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHasherBusy('Timed out waiting for a password check')
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self._prefix
+
+
+def _build_password_hasher(config):
+    return PasswordHasher(
+        method=config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000'),
+        workers=config.get('PASSWORD_HASH_WORKERS') or None,
+        max_pending=config.get('PASSWORD_HASH_QUEUE', 32),
+        timeout=config.get('PASSWORD_HASH_TIMEOUT', 10.0),
+    )
+
+
+def get_password_hasher(app=None):
+    """Return the app's password hasher (default ``current_app``), building it from its config on first use."""
+    return app_extension('password_hasher', _build_password_hasher, app)
+
+
+def benchmark_logins(method, seconds=5.0, threads=None):
+    """Measure password checks per second for ``method`` across ``threads`` threads."""
+    threads = threads or os.cpu_count() or 1
+    password_hash = generate_password_hash('benchmark-password', method)
+    deadline = time.perf_counter() + seconds
+    counts = [0] * threads
+
+    def work(slot):
+        while time.perf_counter() < deadline:
+            check_password_hash(password_hash, 'benchmark-password')
+            counts[slot] += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(slot,)) for slot in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    logins_per_second = sum(counts) / elapsed
+    return {
+        'method': method,
+        'threads': threads,
+        'logins': sum(counts),
+        'seconds': round(elapsed, 2),
+        'logins_per_second': round(logins_per_second, 1),
+        'logins_per_second_per_core': round(logins_per_second / min(threads, os.cpu_count() or 1), 1),
+        'ms_per_login': round(1000 * elapsed * threads / sum(counts), 1) if sum(counts) else None,
+    }
@@ -0,0 +1,175 @@
+import time
+from datetime import date
+
+from sqlalchemy import Date, DateTime, and_, case, func
+
+from models.models import BasketEntry, Payment, Wholesaler, PanShop
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class FieldSet:
+    """The JSON fields a list endpoint can return, each mapped to a SQL column.
+
+    Endpoints select only the columns for the fields a client asked for with
+    ``?fields=`` and turn the result rows straight into dicts, so no ORM
+    objects are built. Date columns are written as ISO strings.
+    """
+
+    def __init__(self, fields, default=None):
+        self.fields = dict(fields)
+        self.default = list(default or self.fields)
+        self._formatters = {
+            name: _isoformat
+            for name, column in self.fields.items()
+            if isinstance(getattr(column, 'type', None), (Date, DateTime))
+        }
+
+    def parse(self, fields_param):
+        """Turn a ``?fields=a,b`` value into field names; raises ValueError on unknown names."""
+        if not fields_param:
+            return list(self.default)
+        names = list(dict.fromkeys(name.strip() for name in fields_param.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return names
+
+    def columns(self, names):
+        return [self.fields[name].label(name) for name in names]
+
+    def dump(self, rows, names, include=None):
+        """Rows selected with ``columns(names)`` as dicts of the ``include`` fields (default: all)."""
+        include = names if include is None else include
+        positions = [names.index(name) for name in include]
+        formatters = [self._formatters.get(name) for name in include]
+        if not any(formatters) and positions == list(range(len(names))):
+            return [dict(zip(include, row)) for row in rows]
+        return [
+            {
+                name: fmt(row[i]) if fmt else row[i]
+                for name, i, fmt in zip(include, positions, formatters)
+            }
+            for row in rows
+        ]
+
+
+BASKET_ENTRY_FIELDS = FieldSet({
+    'id': BasketEntry.id,
+    'party_type': BasketEntry.party_type,
+    'party_id': BasketEntry.party_id,
+    'date': BasketEntry.date,
+    'basket_count': BasketEntry.basket_count,
+    'price_per_basket': BasketEntry.price_per_basket,
+    'total_price': BasketEntry.total_price,
+    'mark': BasketEntry.mark,
+})
+
+PAYMENT_COLUMNS = {
+    'id': Payment.id,
+    'party_type': Payment.party_type,
+    'party_id': Payment.party_id,
+    'amount': Payment.amount,
+    'date': Payment.date,
+    'note': Payment.note,
+    'payment_mode': Payment.payment_mode,
+    'upi_account': Payment.upi_account,
+}
+
+# Only valid with the party tables outer-joined; see PAYMENT_PARTY_JOINS
+PAYMENT_PARTY_NAME = func.coalesce(
+    case(
+        (Payment.party_type == 'wholesaler', Wholesaler.name),
+        (Payment.party_type == 'panshop', PanShop.name)
+    ),
+    'Unknown'
+)
+
+PAYMENT_PARTY_JOINS = (
+    (Wholesaler, and_(Payment.party_type == 'wholesaler', Wholesaler.id == Payment.party_id)),
+    (PanShop, and_(Payment.party_type == 'panshop', PanShop.id == Payment.party_id)),
+)
+
+PAYMENT_FIELDS = FieldSet(
+    dict(PAYMENT_COLUMNS, party_name=PAYMENT_PARTY_NAME),
+    default=['id', 'party_type', 'party_id', 'party_name', 'amount', 'date', 'note', 'payment_mode', 'upi_account']
+)
+
+WHOLESALER_FIELDS = FieldSet({
+    'id': Wholesaler.id,
+    'name': Wholesaler.name,
+    'contact_info': Wholesaler.contact_info,
+    'mark': Wholesaler.mark,
+})
+
+PANSHOP_FIELDS = FieldSet({
+    'id': PanShop.id,
+    'name': PanShop.name,
+    'contact_info': PanShop.contact_info,
+})
+
+HISTORY_BASKET_FIELDS = FieldSet(
+    BASKET_ENTRY_FIELDS.fields,
+    default=['date', 'basket_count', 'price_per_basket', 'total_price', 'mark']
+)
+
+HISTORY_PAYMENT_FIELDS = FieldSet(
+    PAYMENT_COLUMNS,
+    default=['date', 'amount', 'payment_mode', 'upi_account', 'note']
+)
+
+
+def with_required(names, required):
+    """``names`` plus any ``required`` fields the query needs but the client didn't ask for."""
+    return names + [name for name in required if name not in names]
+
+
+def benchmark_list_serialization(session, app, rows=20000, repeat=3):
+    """Time listing ``rows`` basket entries the old way and the new way.
+
+    Synthetic rows are inserted inside a transaction that is rolled back, so
+    the database is left as it was. Returns rows/sec for each approach.
+    """
+    from flask.json.provider import DefaultJSONProvider
+    from sqlalchemy import insert, select
+
+    stdlib_json = DefaultJSONProvider(app)
+
+    session.execute(insert(BasketEntry), [
+        {
+            'party_type': 'wholesaler', 'party_id': 1, 'date': date.today(),
+            'basket_count': i % 7 + 1, 'price_per_basket': 12.5, 'total_price': (i % 7 + 1) * 12.5, 'mark': f'M{i % 50}',
+        }
+        for i in range(rows)
+    ])
+
+    def orm_to_dicts():
+        entries = session.query(BasketEntry).limit(rows).all()
+        payload = [{
+            'id': e.id, 'party_type': e.party_type, 'party_id': e.party_id, 'date': e.date.isoformat(),
+            'basket_count': e.basket_count, 'price_per_basket': e.price_per_basket,
+            'total_price': e.total_price, 'mark': e.mark
+        } for e in entries]
+        session.expunge_all()
+        return stdlib_json.dumps(payload)
+
+    def projected():
+        names = BASKET_ENTRY_FIELDS.default
+        result = session.execute(select(*BASKET_ENTRY_FIELDS.columns(names)).limit(rows)).all()
+        return app.json.dumps(BASKET_ENTRY_FIELDS.dump(result, names))
+
+    timings = {}
+    try:
+        for label, fn in (('orm_to_dict', orm_to_dicts), ('projected', projected)):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = {'seconds': round(best, 4), 'rows_per_second': round(rows / best)}
+    finally:
+        session.rollback()
+    return timings
@@ -0,0 +1,119 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models.models import AuthToken
+from utils.db import db
+from utils.extensions import app_extension
+
+RESET_TOKEN_TTL = timedelta(hours=24)
+VERIFY_TOKEN_TTL = timedelta(days=7)
+
+
+class InMemoryTokenStore:
+    """Tokens in a dict with a heap ordered by expiry; for tests and single-process runs."""
+
+    def __init__(self):
+        self._tokens = {}
+        self._expiry_heap = []
+        self._lock = threading.Lock()
+
+    def put(self, kind, token, user_id, ttl):
+        expires_at = datetime.utcnow() + ttl
+        with self._lock:
+            self._tokens[token] = (kind, user_id, expires_at)
+            heapq.heappush(self._expiry_heap, (expires_at, token))
+            self._sweep_locked()
+
+    def get(self, kind, token):
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None or entry[0] != kind:
+                return None
+            if entry[2] <= datetime.utcnow():
+                del self._tokens[token]
+                return None
+            return entry[1]
+
+    def pop(self, kind, token):
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None or entry[0] != kind:
+                return None
+            del self._tokens[token]
+            return entry[1] if entry[2] > datetime.utcnow() else None
+
+    def revoke_user(self, kind, user_id):
+        with self._lock:
+            tokens = [token for token, entry in self._tokens.items() if entry[0] == kind and entry[1] == user_id]
+            for token in tokens:
+                del self._tokens[token]
+            return len(tokens)
+
+    def sweep(self):
+        with self._lock:
+            return self._sweep_locked()
+
+    def _sweep_locked(self):
+        now = datetime.utcnow()
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, token = heapq.heappop(self._expiry_heap)
+            entry = self._tokens.get(token)
+            # Skip heap entries for tokens already popped or re-issued
+            if entry is not None and entry[2] == expires_at:
+                del self._tokens[token]
+                removed += 1
+        return removed
+
+
+class DatabaseTokenStore:
+    """Tokens in the ``auth_tokens`` table so every worker sees every token.
+
+    Lookups go by primary key and sweeping deletes by the ``expires_at``
+    index. Writes join the caller's transaction; the caller commits.
+    """
+
+    def __init__(self, sweep_interval=60):
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+
+    def put(self, kind, token, user_id, ttl):
+        db.session.merge(AuthToken(token=token, kind=kind, user_id=user_id, expires_at=datetime.utcnow() + ttl))
+        # Expired rows are cleared now and then by whoever writes next
+        if time.monotonic() - self._last_sweep > self.sweep_interval:
+            self._last_sweep = time.monotonic()
+            self.sweep()
+
+    def get(self, kind, token):
+        row = db.session.get(AuthToken, token)
+        if row is None or row.kind != kind or row.expires_at <= datetime.utcnow():
+            return None
+        return row.user_id
+
+    def pop(self, kind, token):
+        row = db.session.get(AuthToken, token)
+        if row is None or row.kind != kind:
+            return None
+        db.session.delete(row)
+        return row.user_id if row.expires_at > datetime.utcnow() else None
+
+    def revoke_user(self, kind, user_id):
+        """Delete every ``kind`` token issued to ``user_id``."""
+        return AuthToken.query.filter_by(kind=kind, user_id=user_id).delete(synchronize_session=False)
+
+    def sweep(self):
+        return AuthToken.query.filter(AuthToken.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+
+
+TOKEN_STORES = {
+    'memory': InMemoryTokenStore,
+    'database': DatabaseTokenStore,
+}
+
+def get_token_store(app=None):
+    """Return the app's token store (default ``current_app``), selected by ``AUTH_TOKEN_STORE``."""
+    return app_extension(
+        'token_store', lambda config: TOKEN_STORES[config.get('AUTH_TOKEN_STORE', 'database')](), app
+    )
@@ -0,0 +1,33 @@
+import math
+
+
+def parse_number(value, field, integer=False):
+    """Convert a client-supplied value to a finite, non-negative number.
+
+    Accepts numbers and numeric strings; rejects booleans, NaN/infinity,
+    negatives and, when ``integer`` is set, fractional values. Raises
+    ValueError with a message fit to return to the client.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f'{field} must be a number')
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f'{field} must be a number')
+    if not math.isfinite(number):
+        raise ValueError(f'{field} must be a finite number')
+    if number < 0:
+        raise ValueError(f'{field} cannot be negative')
+    if integer:
+        if not number.is_integer():
+            raise ValueError(f'{field} must be a whole number')
+        return int(number)
+    return number
+
+
+def coerce_numbers(values, fields):
+    """Run ``parse_number`` on each of ``fields`` (name -> int or float) present in ``values``, in place."""
+    for field, convert in fields.items():
+        if field in values:
+            values[field] = parse_number(values[field], field, integer=convert is int)
+    return values
@@ -72,7 +72,8 @@ function OCRUpload() {
       const lines = res.data.text.split("\n").filter(line => line.trim());
       console.log("Filtered Lines:", lines);
       
-      const rows = lines.map(line => {
+      // Prefer the rows the backend rebuilt from the OCR box positions
+      const rows = res.data.rows || lines.map(line => {
         // Updated regex to match format like "1200 BSMR 21-07-2025"
         // More flexible pattern to handle various spacing and formats
         const match = line.match(/^\s*(\d+[\d,\.]*)\s+([A-Za-z0-9]+)\s+([\d\-\.\/]+\s*\-?\s*[\d\-\.\/]*)\s*(.*)$/);